@@ -1,16 +1,37 @@
 import pygame
 import os
+import sys
+import multiprocessing
 from pygame.locals import *
 import constants as SOKOBAN
 from game import *
+from text_cache import render_text
+from level_pack import LevelDirectory, open_pack, level_label
+
+TUTORIAL_TEXT = [
+    "Mục tiêu:",
+    "Đặt tất cả các hộp lên các điểm đích trên bản đồ.",
+    "Điều khiển:",
+    "Mũi tên hoặc WASD để di chuyển nhân vật.",
+    "R - Chơi lại.",
+    "Esc - Thoát game.",
+    "Lưu ý:",
+    "- Điểm số sẽ tính dựa trên số bước đi, nhân vật di chuyển qua tường hoặc đẩy 2 thùng vẫn tính 1 lượt",
+    "- Không thể đẩy hộp ra khỏi bản đồ hoặc đẩy vào các vật cản không di chuyển được.",
+    "- Bạn chỉ có thể đẩy một hộp một lúc.",
+    "- Bạn không thể kéo các hộp.",
+    "- 'Auto' để vượt qua màn chơi.",
+    "- 'Undo the last move' để đưa thùng lại vị trí trước đó"
+]
+
 
 class Menu:
-    def __init__(self):
+    def __init__(self, pack=None):
         """
         Initializes a new Menu object.
 
         Args:
-            None
+            pack (LevelPack): The levels to play, the bundled levels when None.
 
         Returns:
             None
@@ -25,6 +46,40 @@ class Menu:
         self.smaller_font = pygame.font.Font('assets/fonts/FreeSansBold.ttf', 18)
         self.tutorial_active = False
         self.scoreboard_active = False
+        self.pack = pack if pack is not None else LevelDirectory()
+        self.layout()
+
+    def layout(self):
+        """
+        Renders the labels of the menu and the tutorial and computes their positions, once.
+
+        Returns:
+            None
+        """
+        self.new_game_txt_surface = render_text(self.font, self.new_game_txt, SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.new_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.new_game_txt_surface.get_width() / 2), 300)
+        self.load_game_txt_surface = render_text(self.font, self.load_game_txt, SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.extreme_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.load_game_txt_surface.get_width() / 2), 370)
+        self.tutorial_txt_surface = render_text(self.font, self.tutorial_txt, SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.tutorial_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.tutorial_txt_surface.get_width() / 2), 440)
+        self.scoreboard_txt_surface = render_text(self.font, self.scoreboard_txt, SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.scoreboard_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.scoreboard_txt_surface.get_width() / 2), 510)
+        self.quit_game_txt_surface = render_text(self.font, self.quit_game_txt, SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.quit_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.quit_game_txt_surface.get_width() / 2), 580)
+        self.back_txt_surface = render_text(self.smaller_font, "Back", SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.back_txt_position = (20, 20)
+
+        self.tutorial_lines = []
+        text_y = 100
+        for line in TUTORIAL_TEXT:
+            text_surface = render_text(self.smaller_font, line, SOKOBAN.BLACK, SOKOBAN.WHITE)
+            self.tutorial_lines.append((text_surface, ((SOKOBAN.WINDOW_WIDTH / 2) - (text_surface.get_width() / 2), text_y)))
+            text_y += 30
+
+        self.scoreboard_title = render_text(self.font, "Scoreboard", SOKOBAN.BLACK, SOKOBAN.WHITE)
+        self.scoreboard_title_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.scoreboard_title.get_width() / 2), 100)
+        self.scoreboard_shown = None # scoreboard laid out in scoreboard_lines
+        self.scoreboard_lines = []
 
     def click(self, click_pos, window):
         """
@@ -43,12 +98,12 @@ class Menu:
         if not self.tutorial_active and not self.scoreboard_active:
             if x > self.new_game_txt_position[0] and x < self.new_game_txt_position[0] + self.new_game_txt_surface.get_width() \
             and y > 300 and y < 300 + self.new_game_txt_surface.get_height():
-                sokoban = Game(window)
+                sokoban = Game(window, self.pack)
                 sokoban.start()
-            elif x > self.extreme_game_txt_position[0] and x < self.extreme_game_txt_position[0] + self.load_game_txt_surface.get_width() \
+            elif self.pack.extreme_level and x > self.extreme_game_txt_position[0] and x < self.extreme_game_txt_position[0] + self.load_game_txt_surface.get_width() \
             and y > 370 and y < 370 + self.load_game_txt_surface.get_height():
-                sokoban = Game(window)
-                sokoban.index_level = 16
+                sokoban = Game(window, self.pack)
+                sokoban.index_level = sokoban.pack.extreme_level
                 sokoban.load_level()
                 sokoban.start(play_music=False)
             elif x > self.tutorial_txt_position[0] and x < self.tutorial_txt_position[0] + self.tutorial_txt_surface.get_width() \
@@ -80,25 +135,11 @@ class Menu:
             None
         """
         window.blit(self.image, (0,0))
-
-        self.new_game_txt_surface = self.font.render(self.new_game_txt, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.new_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.new_game_txt_surface.get_width() / 2), 300)
         window.blit(self.new_game_txt_surface, self.new_game_txt_position)
-
-        self.load_game_txt_surface = self.font.render(self.load_game_txt, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.extreme_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.load_game_txt_surface.get_width() / 2), 370)
-        window.blit(self.load_game_txt_surface, self.extreme_game_txt_position)
-
-        self.tutorial_txt_surface = self.font.render(self.tutorial_txt, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.tutorial_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.tutorial_txt_surface.get_width() / 2), 440)
+        if self.pack.extreme_level:
+            window.blit(self.load_game_txt_surface, self.extreme_game_txt_position)
         window.blit(self.tutorial_txt_surface, self.tutorial_txt_position)
-
-        self.scoreboard_txt_surface = self.font.render(self.scoreboard_txt, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.scoreboard_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.scoreboard_txt_surface.get_width() / 2), 510)
         window.blit(self.scoreboard_txt_surface, self.scoreboard_txt_position)
-
-        self.quit_game_txt_surface = self.font.render(self.quit_game_txt, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.quit_game_txt_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.quit_game_txt_surface.get_width() / 2), 580)
         window.blit(self.quit_game_txt_surface, self.quit_game_txt_position)
 
     def render_tutorial(self, window):
@@ -112,31 +153,8 @@ class Menu:
             None
         """
         window.fill(SOKOBAN.WHITE)
-
-        tutorial_text = [
-            "Mục tiêu:",
-            "Đặt tất cả các hộp lên các điểm đích trên bản đồ.",
-            "Điều khiển:",
-            "Mũi tên hoặc WASD để di chuyển nhân vật.",
-            "R - Chơi lại.",
-            "Esc - Thoát game.",
-            "Lưu ý:",
-            "- Điểm số sẽ tính dựa trên số bước đi, nhân vật di chuyển qua tường hoặc đẩy 2 thùng vẫn tính 1 lượt",
-            "- Không thể đẩy hộp ra khỏi bản đồ hoặc đẩy vào các vật cản không di chuyển được.",
-            "- Bạn chỉ có thể đẩy một hộp một lúc.",
-            "- Bạn không thể kéo các hộp.",
-            "- 'Auto' để vượt qua màn chơi.",
-            "- 'Undo the last move' để đưa thùng lại vị trí trước đó"
-        ]
-        text_y = 100
-        for line in tutorial_text:
-            text_surface = self.smaller_font.render(line, True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-            text_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (text_surface.get_width() / 2), text_y)
+        for text_surface, text_position in self.tutorial_lines:
             window.blit(text_surface, text_position)
-            text_y += 30
-        
-        self.back_txt_surface = self.smaller_font.render("Back", True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.back_txt_position = (20, 20)
         window.blit(self.back_txt_surface, self.back_txt_position)
 
         pygame.display.flip()
@@ -153,24 +171,21 @@ class Menu:
         scoreboard = self.get_scoreboard()
         window.fill(SOKOBAN.WHITE)
 
-        scoreboard_title = self.font.render("Scoreboard", True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        scoreboard_title_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (scoreboard_title.get_width() / 2), 100)
-        window.blit(scoreboard_title, scoreboard_title_position)
-
-        y_position = 150
-        for level, steps in scoreboard.items():
-            level_text = self.smaller_font.render(f"Level {level}:", True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-            level_text_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (level_text.get_width() / 2), y_position)
-            window.blit(level_text, level_text_position)
-
-            steps_text = self.smaller_font.render(str(steps), True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-            steps_text_position = (level_text_position[0] + level_text.get_width() + 10, y_position)
-            window.blit(steps_text, steps_text_position)
-
-            y_position += 40
-
-        self.back_txt_surface = self.smaller_font.render("Back", True, SOKOBAN.BLACK, SOKOBAN.WHITE)
-        self.back_txt_position = (20, 20)
+        if scoreboard != self.scoreboard_shown:
+            self.scoreboard_shown = scoreboard
+            self.scoreboard_lines = []
+            y_position = 150
+            for level, steps in scoreboard.items():
+                level_text = render_text(self.smaller_font, f"Level {level_label(level)}:", SOKOBAN.BLACK, SOKOBAN.WHITE)
+                level_text_position = ((SOKOBAN.WINDOW_WIDTH / 2) - (level_text.get_width() / 2), y_position)
+                steps_text = render_text(self.smaller_font, str(steps), SOKOBAN.BLACK, SOKOBAN.WHITE)
+                steps_text_position = (level_text_position[0] + level_text.get_width() + 10, y_position)
+                self.scoreboard_lines += [(level_text, level_text_position), (steps_text, steps_text_position)]
+                y_position += 40
+
+        window.blit(self.scoreboard_title, self.scoreboard_title_position)
+        for text_surface, text_position in self.scoreboard_lines:
+            window.blit(text_surface, text_position)
         window.blit(self.back_txt_surface, self.back_txt_position)
 
         pygame.display.flip()
@@ -180,15 +195,15 @@ class Menu:
         Retrieves the current scoreboard.
 
         Returns:
-            dict: The current scoreboard where level numbers are keys and minimum steps are values.
+            dict: The current scoreboard where level keys (see LevelPack.level_key) are keys and minimum steps are values.
         """
         scoreboard_file = "assets/scoreboard.txt"
         scoreboard = {}
         if os.path.isfile(scoreboard_file):
             with open(scoreboard_file, 'r') as file:
                 for line in file:
-                    level, steps = line.strip().split(':')
-                    scoreboard[int(level)] = int(steps)
+                    level, steps = line.strip().rsplit(':', 1)
+                    scoreboard[level] = int(steps)
         return scoreboard
 
 
@@ -207,7 +222,9 @@ def main():
     pygame.key.set_repeat(100, 100)
     pygame.display.set_caption("Sokoban Game")
     window = pygame.display.set_mode((SOKOBAN.WINDOW_WIDTH, SOKOBAN.WINDOW_HEIGHT))
-    menu = Menu()
+    # A level pack (XSB file or directory of level files) may be given on the command line
+    pack = open_pack(sys.argv[1]) if len(sys.argv) > 1 else None
+    menu = Menu(pack)
 
     run = True
     while run:
@@ -216,10 +233,10 @@ def main():
             run = False
         if event.type == KEYDOWN:
             if event.key == K_j:
-                sokoban = Game(window)
+                sokoban = Game(window, pack)
                 sokoban.start(play_music=False)
             elif event.key == K_c:
-                sokoban = Game(window)
+                sokoban = Game(window, pack)
             elif event.key == K_ESCAPE:
                 run = False
         if event.type == MOUSEBUTTONUP:
@@ -241,4 +258,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from solver import loadLevelFile, naturalKey, solve, SearchStats, METHODS
+try:
+    import resource # POSIX only, used to read the peak memory of a run
+except ImportError:
+    resource = None
+
+"""Solver benchmark: python -m benchmark [--levels DIR ...] [--out results.json] [--baseline old.json]"""
+
+MODES = ('moves', 'pushes')
+# Metrics where a larger value is worse, compared against the baseline
+COMPARED_METRICS = ('seconds', 'expanded', 'generated', 'peak_rss_kb', 'length')
+
+def peakRssKb():
+    """Return the peak resident memory of the current process in kilobytes, None when unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak # macOS reports bytes, Linux kilobytes
+
+def benchmarkWorker(levelPath, method, mode, connection):
+    """Solve one case in a fresh process, so that its peak memory is its own, and send back its record"""
+    gameState = loadLevelFile(levelPath)
+    stats = SearchStats()
+    start = time.perf_counter()
+    strategy = solve(gameState, method, mode, stats=stats)
+    seconds = time.perf_counter() - start
+    connection.send({
+        'status': 'solved' if strategy else 'no solution',
+        'seconds': seconds,
+        'expanded': stats.expanded,
+        'generated': stats.generated,
+        'nodes_per_second': stats.generated / seconds if seconds else None,
+        'peak_rss_kb': peakRssKb(),
+        'length': len(strategy),
+        'pushes': sum(1 for x in strategy if x.isupper()),
+        'duplicates': stats.duplicates,
+        'pruned': stats.pruned,
+        'corral_pruned': stats.corralPruned,
+        'dead_ends': stats.deadEnds,
+        'bounded': stats.bounded,
+        'peak_frontier': stats.peakFrontier,
+        'peak_explored': stats.peakExplored,
+    })
+    connection.close()
+
+def runCase(levelPath, method, mode, timeLimit):
+    """Run one (level, method, mode) case under a time limit and return its record"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=benchmarkWorker, args=(levelPath, method, mode, sender), daemon=True)
+    process.start()
+    sender.close()
+    record = None
+    if receiver.poll(timeLimit or None):
+        try:
+            record = receiver.recv()
+        except EOFError: # the worker died before reporting
+            record = {'status': 'crashed'}
+    else:
+        process.terminate()
+        record = {'status': 'time limit'}
+    process.join()
+    receiver.close()
+    record.update({'level': os.path.basename(levelPath), 'method': method, 'mode': mode})
+    return record
+
+def runBenchmark(levelDirs, methods=METHODS, modes=MODES, timeLimit=60):
+    """Run every method and mode over every level of the given directories and return the results document"""
+    cases = {}
+    for levelDir in levelDirs:
+        levels = sorted((os.path.join(levelDir, name) for name in os.listdir(levelDir) if name.endswith('.txt')), key=naturalKey)
+        for levelPath in levels:
+            for method in methods:
+                for mode in modes:
+                    record = runCase(levelPath, method, mode, timeLimit)
+                    cases['%s/%s/%s' % (levelPath, method, mode)] = record
+                    print('%-40s %-7s %-7s %-12s %9s %9s' % (levelPath, method, mode, record['status'],
+                          '%.3f' % record['seconds'] if 'seconds' in record else '-', record.get('expanded', '-')))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time_limit': timeLimit,
+        'cases': cases,
+    }
+
+def compareResults(results, baseline, threshold, minSeconds):
+    """Return the regressions of results against baseline: a case no longer solved, or a metric grown by more
+    than threshold (a fraction); times below minSeconds are considered noise"""
+    regressions = []
+    for name, old in baseline['cases'].items():
+        new = results['cases'].get(name)
+        if new is None:
+            continue
+        if old['status'] == 'solved' and new['status'] != 'solved':
+            regressions.append('%s: %s -> %s' % (name, old['status'], new['status']))
+            continue
+        if new['status'] != 'solved':
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = old.get(metric), new.get(metric)
+            if before is None or after is None:
+                continue
+            if metric == 'seconds' and max(before, after) < minSeconds:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append('%s: %s %s -> %s' % (name, metric, before, after))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmark the Sokoban solver')
+    parser.add_argument('--levels', nargs='+', default=['assets/sokobanLevels'], help='directories of level files')
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=METHODS)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--time-limit', type=float, default=60, help='seconds allowed per case, 0 for none')
+    parser.add_argument('--out', default='bench_results.json', help='file receiving the JSON results')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative growth of a metric counted as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='times below this are not compared')
+    args = parser.parse_args(argv)
+
+    results = runBenchmark(args.levels, args.methods, args.modes, args.time_limit)
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compareResults(results, baseline, args.threshold, args.min_seconds)
+    for regression in regressions:
+        print('REGRESSION', regression)
+    print('%d regression(s) against %s' % (len(regressions), args.baseline))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
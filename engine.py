@@ -0,0 +1,410 @@
+import numpy as np
+import constants as SOKOBAN
+
+"""Headless Sokoban rules of the game: level parsing, moves, pushes and the win check on Level.structure.
+The solver reads its move letters and levels from here but applies the rules itself on its bitmask
+encoding, see solver.legalActions. This module must not import pygame."""
+
+# Level file characters, of the bundled levels and of the standard XSB format; the player position is returned separately
+TILES = {' ': SOKOBAN.AIR, '#': SOKOBAN.WALL, 'B': SOKOBAN.BOX, '.': SOKOBAN.TARGET, 'X': SOKOBAN.TARGET_FILLED, '&': SOKOBAN.AIR,
+         '-': SOKOBAN.AIR, '_': SOKOBAN.AIR, '$': SOKOBAN.BOX, '*': SOKOBAN.TARGET_FILLED, '@': SOKOBAN.AIR, '+': SOKOBAN.TARGET}
+PLAYER_CHARS = '&@+'
+# Move letters and their (dx, dy) offsets, in the order the solver tries them; a push is written in upper case
+DIRECTIONS = {'u': (0, -1), 'd': (0, 1), 'l': (-1, 0), 'r': (1, 0)}
+# Facing of the player sprite for each move letter
+FACINGS = {'u': SOKOBAN.UP, 'd': SOKOBAN.DOWN, 'l': SOKOBAN.LEFT, 'r': SOKOBAN.RIGHT}
+FREE = (SOKOBAN.AIR, SOKOBAN.TARGET)
+BOXES = (SOKOBAN.BOX, SOKOBAN.TARGET_FILLED)
+
+
+def parse_level(rows):
+    """
+    Builds the structure of a level from the rows of its file.
+
+    Args:
+        rows (list): The lines of the level file.
+
+    Returns:
+        tuple: The structure (a list of rows of tiles) and the position [x, y] of the player, None if absent.
+    """
+    structure = []
+    player_pos = None
+    for y, row in enumerate(rows):
+        structure.append([TILES[char] for char in row if char in TILES])
+        for x, char in enumerate(row):
+            if char in PLAYER_CHARS:
+                player_pos = [x, y]
+    return structure, player_pos
+
+
+def load_level(path):
+    """
+    Reads a level file.
+
+    Args:
+        path (str): The level file.
+
+    Returns:
+        tuple: The structure and the position [x, y] of the player, as returned by parse_level.
+    """
+    with open(path) as level_file:
+        return parse_level(level_file.read().split('\n'))
+
+
+def tile_at(structure, x, y):
+    """
+    Returns the tile of a cell, a wall outside the structure.
+
+    Args:
+        structure (list): The level structure.
+        x (int): The column of the cell.
+        y (int): The row of the cell.
+
+    Returns:
+        int: The tile of the cell.
+    """
+    if 0 <= y < len(structure) and 0 <= x < len(structure[y]):
+        return structure[y][x]
+    return SOKOBAN.WALL
+
+
+def try_move(structure, player_pos, direction):
+    """
+    Checks a move without playing it.
+
+    Args:
+        structure (list): The level structure.
+        player_pos (list): The position [x, y] of the player.
+        direction (str): The move letter, 'u', 'd', 'l' or 'r' in either case.
+
+    Returns:
+        str: The lower case letter for a walk, the upper case letter for a push, or None if the move is blocked.
+    """
+    letter = direction.lower()
+    dx, dy = DIRECTIONS[letter]
+    x, y = player_pos[0] + dx, player_pos[1] + dy
+    tile = tile_at(structure, x, y)
+    if tile in FREE:
+        return letter
+    if tile in BOXES and tile_at(structure, x + dx, y + dy) in FREE:
+        return letter.upper()
+    return None
+
+
+def step(structure, player_pos, direction):
+    """
+    Plays a move, updating the structure and the player position in place.
+
+    Args:
+        structure (list): The level structure.
+        player_pos (list): The position [x, y] of the player.
+        direction (str): The move letter, 'u', 'd', 'l' or 'r' in either case.
+
+    Returns:
+        str: The lower case letter for a walk, the upper case letter for a push, or None if the move is blocked.
+    """
+    move = try_move(structure, player_pos, direction)
+    if move is None:
+        return None
+    dx, dy = DIRECTIONS[move.lower()]
+    x, y = player_pos[0] + dx, player_pos[1] + dy
+    if move.isupper():
+        structure[y][x] = SOKOBAN.TARGET if structure[y][x] == SOKOBAN.TARGET_FILLED else SOKOBAN.AIR
+        structure[y + dy][x + dx] = SOKOBAN.TARGET_FILLED if structure[y + dy][x + dx] == SOKOBAN.TARGET else SOKOBAN.BOX
+    player_pos[0], player_pos[1] = x, y
+    return move
+
+
+def is_solved(structure):
+    """
+    Checks if every target holds a box.
+
+    Args:
+        structure (list): The level structure.
+
+    Returns:
+        bool: True if no empty target is left, False otherwise.
+    """
+    return not any(SOKOBAN.TARGET in row for row in structure)
+
+
+def replay(structure, player_pos, moves):
+    """
+    Plays moves on a copy of a level and checks that they solve it.
+
+    Every move must be legal and its case must tell whether it pushes a box.
+
+    Args:
+        structure (list): The level structure, left unchanged.
+        player_pos (list): The position [x, y] of the player, left unchanged.
+        moves (iterable): The move letters.
+
+    Returns:
+        bool: True if the moves solve the level, False otherwise.
+    """
+    structure = [list(row) for row in structure]
+    player_pos = list(player_pos)
+    for move in moves:
+        if move.lower() not in DIRECTIONS or step(structure, player_pos, move) != move:
+            return False
+    return is_solved(structure)
+
+
+
+class MoveJournal:
+    def __init__(self):
+        """
+        Initializes a new MoveJournal object.
+
+        Each entry records one move: its letter, the player position before it and,
+        for a push, the two cells it changed with their old and new tiles. Undo and
+        redo only touch those cells, so both are O(1) whatever the size of the board.
+
+        Returns:
+            None
+        """
+        self.entries = []
+        self.cursor = 0 # number of entries currently played; the ones after it can be redone
+        self.changes = 0 # moves played, taken back or played again so far, so a renderer can count those since a frame
+
+    def play(self, structure, player_pos, direction):
+        """
+        Plays a move and records it, dropping the moves that could have been redone.
+
+        Args:
+            structure (list): The level structure.
+            player_pos (list): The position [x, y] of the player.
+            direction (str): The move letter, 'u', 'd', 'l' or 'r' in either case.
+
+        Returns:
+            str: The move played, as returned by step, or None if it is blocked.
+        """
+        move = try_move(structure, player_pos, direction)
+        if move is None:
+            return None
+        cells = ()
+        if move.isupper():
+            dx, dy = DIRECTIONS[move.lower()]
+            x, y = player_pos[0] + dx, player_pos[1] + dy
+            old = (structure[y][x], structure[y + dy][x + dx])
+            step(structure, player_pos, move)
+            cells = ((x, y, old[0], structure[y][x]), (x + dx, y + dy, old[1], structure[y + dy][x + dx]))
+            before = (x - dx, y - dy)
+        else:
+            before = tuple(player_pos)
+            step(structure, player_pos, move)
+        del self.entries[self.cursor:]
+        self.entries.append((move, before, cells))
+        self.cursor += 1
+        self.changes += 1
+        return move
+
+    def undo(self, structure, player_pos):
+        """
+        Takes back the last move played.
+
+        Args:
+            structure (list): The level structure.
+            player_pos (list): The position [x, y] of the player.
+
+        Returns:
+            str: The move taken back, or None if there is none.
+        """
+        if not self.cursor:
+            return None
+        self.cursor -= 1
+        self.changes += 1
+        move, before, cells = self.entries[self.cursor]
+        for x, y, old, new in cells:
+            structure[y][x] = old
+        player_pos[0], player_pos[1] = before
+        return move
+
+    def redo(self, structure, player_pos):
+        """
+        Plays again the last move taken back.
+
+        Args:
+            structure (list): The level structure.
+            player_pos (list): The position [x, y] of the player.
+
+        Returns:
+            str: The move played again, or None if there is none.
+        """
+        if self.cursor == len(self.entries):
+            return None
+        move, before, cells = self.entries[self.cursor]
+        self.cursor += 1
+        self.changes += 1
+        for x, y, old, new in cells:
+            structure[y][x] = new
+        dx, dy = DIRECTIONS[move.lower()]
+        player_pos[0], player_pos[1] = before[0] + dx, before[1] + dy
+        return move
+
+    def rewind(self):
+        """
+        Marks every move as taken back, after the level was reloaded in its initial state, so they can be redone.
+
+        Returns:
+            None
+        """
+        self.cursor = 0
+
+    def can_undo(self):
+        """
+        Checks if a move can be taken back.
+
+        Returns:
+            bool: True if a move was played, False otherwise.
+        """
+        return self.cursor > 0
+
+    def can_redo(self):
+        """
+        Checks if a move can be played again.
+
+        Returns:
+            bool: True if a move was taken back, False otherwise.
+        """
+        return self.cursor < len(self.entries)
+
+    def moves(self):
+        """
+        Returns the moves played so far.
+
+        Returns:
+            list: The letters of the moves before the cursor.
+        """
+        return [move for move, _, _ in self.entries[:self.cursor]]
+
+
+"""Batch simulation: N boards stacked in one NumPy array are stepped together"""
+
+MOVE_LETTERS = 'udlr' # move codes of the batch functions are indices in this string, -1 leaves a board unchanged
+MOVE_OFFSETS = np.array([DIRECTIONS[letter] for letter in MOVE_LETTERS] + [(0, 0)], dtype=np.intp) # the last row serves code -1
+MOVE_DX, MOVE_DY = MOVE_OFFSETS[:, 0].copy(), MOVE_OFFSETS[:, 1].copy() # its columns, faster to index one at a time
+FREE_TILES = np.zeros(max(TILES.values()) + 1, dtype=bool)
+FREE_TILES[list(FREE)] = True
+BOX_TILES = np.zeros(max(TILES.values()) + 1, dtype=bool)
+BOX_TILES[list(BOXES)] = True
+# Tile left behind by a pushed box and tile of the cell it is pushed onto, indexed by the old tile
+LEFT_TILES = np.array([SOKOBAN.TARGET if tile == SOKOBAN.TARGET_FILLED else SOKOBAN.AIR for tile in range(len(FREE_TILES))], dtype=np.int8)
+ENTERED_TILES = np.array([SOKOBAN.TARGET_FILLED if tile == SOKOBAN.TARGET else SOKOBAN.BOX for tile in range(len(FREE_TILES))], dtype=np.int8)
+
+
+def stack_boards(levels):
+    """
+    Stacks levels into the arrays used by the batch functions.
+
+    Rows are padded with walls to the size of the largest level.
+
+    Args:
+        levels (list): The (structure, player_pos) pairs of the levels.
+
+    Returns:
+        tuple: The boards, an int8 array of shape (N, height, width), and the player positions, an array of shape (N, 2) holding [x, y].
+    """
+    height = max(len(structure) for structure, _ in levels)
+    width = max(len(row) for structure, _ in levels for row in structure)
+    boards = np.full((len(levels), height, width), SOKOBAN.WALL, dtype=np.int8)
+    players = np.empty((len(levels), 2), dtype=np.intp)
+    for index, (structure, player_pos) in enumerate(levels):
+        for y, row in enumerate(structure):
+            boards[index, y, :len(row)] = row
+        players[index] = player_pos
+    return boards, players
+
+
+def move_codes(moves):
+    """
+    Converts move letters, in either case, to the move codes of the batch functions.
+
+    Args:
+        moves (iterable): The move letters; None leaves a board unchanged.
+
+    Returns:
+        numpy.ndarray: The move codes.
+    """
+    return np.array([-1 if move is None else MOVE_LETTERS.index(move.lower()) for move in moves], dtype=np.intp)
+
+
+def step_batch(boards, players, moves, in_place=False, check_solved=False):
+    """
+    Plays one move on every board of a batch.
+
+    The boards must be surrounded by walls, as every level is. They are read
+    and written through flat cell indices, so a step costs a few gathers and
+    scatters whatever the size of the boards.
+
+    Args:
+        boards (numpy.ndarray): The boards, as returned by stack_boards.
+        players (numpy.ndarray): The player positions [x, y], as returned by stack_boards.
+        moves (numpy.ndarray): One move code per board, see move_codes.
+        in_place (bool): Update boards and players instead of copies of them.
+        check_solved (bool): Also check which boards are solved, a scan of every board; see solved_batch.
+
+    Returns:
+        tuple: The new boards, the new player positions, and three arrays: the boards where the move was
+        played (False for a blocked move or code -1), the ones where it pushed a box and the solved ones,
+        None unless check_solved is set.
+    """
+    if not in_place:
+        boards, players = boards.copy(), players.copy()
+    elif not boards.flags.c_contiguous:
+        raise ValueError("in_place needs C-contiguous boards, as returned by stack_boards")
+    count, height, width = boards.shape
+    cells = boards.reshape(-1) # a view of the contiguous boards
+    dx, dy = MOVE_DX.take(moves), MOVE_DY.take(moves)
+    step = dy * width + dx
+    first_cell = np.arange(0, count * height * width, height * width) + players[:, 1] * width + players[:, 0] + step
+    second_cell = first_cell + step
+    first = cells.take(first_cell)
+    second = cells.take(second_cell, mode='clip') # only read past a wall, where no box can be pushed
+    pushed = BOX_TILES.take(first) & FREE_TILES.take(second)
+    moved = (FREE_TILES.take(first) | pushed) & (moves >= 0)
+    if pushed.any():
+        cells[first_cell[pushed]] = LEFT_TILES.take(first[pushed])
+        cells[second_cell[pushed]] = ENTERED_TILES.take(second[pushed])
+    players[:, 0] += dx * moved
+    players[:, 1] += dy * moved
+    return boards, players, moved, pushed, solved_batch(boards) if check_solved else None
+
+
+def solved_batch(boards):
+    """
+    Checks which boards of a batch have every target holding a box.
+
+    Args:
+        boards (numpy.ndarray): The boards, as returned by stack_boards.
+
+    Returns:
+        numpy.ndarray: The boolean array of the solved boards.
+    """
+    return ~(boards == SOKOBAN.TARGET).any(axis=(1, 2))
+
+
+def replay_batch(boards, players, solutions):
+    """
+    Checks many solutions at once, each on its own board, like replay does for one.
+
+    Args:
+        boards (numpy.ndarray): The boards, as returned by stack_boards, left unchanged.
+        players (numpy.ndarray): The player positions, as returned by stack_boards, left unchanged.
+        solutions (list): One sequence of move letters per board.
+
+    Returns:
+        numpy.ndarray: The boolean array of the solutions that solve their board.
+    """
+    boards, players = boards.copy(), players.copy()
+    length = max((len(moves) for moves in solutions), default=0)
+    letters = [list(moves) + [None] * (length - len(moves)) for moves in solutions]
+    valid = np.ones(len(boards), dtype=bool)
+    for turn in range(length):
+        column = [moves[turn] for moves in letters]
+        codes = move_codes(column)
+        playing = codes >= 0
+        upper = np.array([move is not None and move.isupper() for move in column])
+        _, _, moved, pushed, _ = step_batch(boards, players, codes, in_place=True) # solved once, at the end
+        valid &= ~playing | (moved & (pushed == upper))
+    return valid & solved_batch(boards)
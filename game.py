@@ -3,47 +3,36 @@ import sys
 from pygame.locals import *
 import constants as SOKOBAN
 from level import *
+from level_pack import LevelDirectory
 from player import *
 from player_interface import *
 from solver import *
-from pyautogui import press, typewrite, hotkey
+from solution_cache import SolutionCache
+import engine
+from text_cache import render_text
 import os
-import _thread
 import time
+import multiprocessing
 import pygame.mixer
 
-
-def move(threadName, delay, strategy):
-    """
-    Simulates the player's moves based on a given strategy.
-
-    Args:
-        threadName (str): The name of the thread.
-        delay (int): The delay between each move.
-        strategy (list): The list of moves to simulate.
-
-    Returns:
-        None
-    """
-    for step in strategy:
-        if step in ['R', 'r']:
-            press('right')
-        if step in ['L', 'l']:
-            press('left')
-        if step in ['D', 'd']:
-            press('down')
-        if step in ['U', 'u']:
-            press('up')
-        time.sleep(0.2)
+SOLVER_EVENT = pygame.USEREVENT + 1 # timer event polling the background solver
+SOLVER_POLL_MS = 100
+AUTO_METHOD = 'anytime' # solver configuration used by the Auto button
+AUTO_MODE = 'moves'
+AUTO_SECONDS = 10 # search time after which Auto plays the best solution found so far
+PLAYBACK_EVENT = pygame.USEREVENT + 2 # timer event playing the next moves of a strategy
+PLAYBACK_RATE = 5 # moves per second played by Auto
+TURBO_MOVES_PER_FRAME = 1000 # moves applied before each render in turbo mode
 
 
 class Game:
-    def __init__(self, window):
+    def __init__(self, window, pack=None):
         """
         Initializes a new Game object.
 
         Args:
             window (pygame.Surface): The Pygame window.
+            pack (LevelPack): The levels to play, the bundled levels when None.
 
         Returns:
             None
@@ -51,7 +40,21 @@ class Game:
         self.window = window
         self.load_textures()
         self.player = None
-        self.index_level = 13
+        self.level = None
+        self.drawn_level = None # level, player position and journal change count shown by the last frame
+        self.drawn_player_pos = None
+        self.drawn_changes = 0
+        self.steps_rect = None
+        self.steps_text = None
+        self.solver_process = None
+        self.solver_connection = None
+        self.solution_cache = SolutionCache()
+        self.playback = [] # moves of the strategy being played back, and the index of the next one
+        self.playback_index = 0
+        self.playback_rate = PLAYBACK_RATE
+        self.turbo = False
+        self.pack = pack if pack is not None else LevelDirectory()
+        self.index_level = self.pack.first_level
         self.load_level()
         self.play = True
         self.player_interface = PlayerInterface(self.player, self.level)
@@ -82,11 +85,16 @@ class Game:
         Returns:
             None
         """
-        self.level = Level(self.index_level)
+        self.cancel_solver()
+        self.stop_playback()
+        # Restarting the same level keeps its moves, which can then be replayed with redo
+        journal = self.level.journal if self.level and self.level.number == self.index_level else None
+        self.level = Level(self.index_level, journal, self.pack)
         self.board = pygame.Surface((self.level.width, self.level.height))
         if self.player:
             self.player.pos = self.level.position_player
             self.player_interface.level = self.level
+            self.player_interface.colorTxtCancel = SOKOBAN.GREY
             self.player.move_count = 0
         else:
             self.player = Player(self.level)
@@ -104,6 +112,8 @@ class Game:
         while self.play:
             self.process_event(pygame.event.wait())
             self.update_screen()
+        self.cancel_solver()
+        self.stop_playback()
 
     def process_event(self, event):
         """
@@ -122,64 +132,114 @@ class Game:
             if event.key == K_ESCAPE:
                 # Quit game
                 self.play = False
-            if event.key in [K_UP, K_DOWN, K_LEFT, K_RIGHT, K_w, K_s, K_a, K_d]:
+            if event.key in [K_UP, K_DOWN, K_LEFT, K_RIGHT, K_w, K_s, K_a, K_d] and not self.solver_process and not self.playback:
                 # Move players
                 self.steps += 1
                 self.player.move(event.key, self.level, self.player_interface)
                 if self.has_win():
                     self.index_level += 1
-                    if (self.index_level == 16):
+                    if self.index_level == self.pack.extreme_level or self.index_level > len(self.pack):
                         self.index_level = 1
                     self.player.move_count = 0
                     self.load_level()
             if event.key == K_r:
                 self.load_level()
-            if event.key == K_l:
+            if event.key == K_t:
+                # Toggle turbo playback: the whole strategy is applied before the next render
+                self.turbo = not self.turbo
+            if event.key == K_l and not self.solver_process and not self.playback:
                 self.level.cancel_last_move(self.player, self.player_interface)
+            if event.key == K_y and not self.solver_process and not self.playback:
+                self.level.redo_last_move(self.player, self.player_interface)
         if event.type == MOUSEBUTTONUP:
             self.player_interface.click(event.pos, self.level, self)
         if event.type == MOUSEMOTION:
             self.player_interface.mouse_pos = event.pos
+        if event.type == SOLVER_EVENT:
+            self.poll_solver()
+        if event.type == PLAYBACK_EVENT:
+            self.play_next_moves()
 
     def update_screen(self):
         """
         Updates the game screen.
 
+        The whole window is drawn after a level is loaded; afterwards only the
+        cells touched by the last move and the interface labels are redrawn and
+        sent to the display.
+
         Returns:
             None
         """
-        pygame.draw.rect(self.board, SOKOBAN.WHITE,
-                         (0, 0, self.level.width * SOKOBAN.SPRITESIZE, self.level.height * SOKOBAN.SPRITESIZE))
-        pygame.draw.rect(self.window, SOKOBAN.WHITE, (0, 0, SOKOBAN.WINDOW_WIDTH, SOKOBAN.WINDOW_HEIGHT))
-
-        self.level.render(self.board, self.textures)
-        self.player.render(self.board, self.textures)
-
-        pox_x_board = (SOKOBAN.WINDOW_WIDTH / 2) - (self.board.get_width() / 2)
-        pos_y_board = (SOKOBAN.WINDOW_HEIGHT / 2) - (self.board.get_height() / 2)
-        self.window.blit(self.board, (pox_x_board, pos_y_board))
-
-        self.player_interface.render(self.window, self.index_level)
-        pygame.draw.rect(self.board, SOKOBAN.WHITE,
-                         (0, 0, self.level.width * SOKOBAN.SPRITESIZE, self.level.height * SOKOBAN.SPRITESIZE))
-        pygame.draw.rect(self.window, SOKOBAN.WHITE, (0, 0, SOKOBAN.WINDOW_WIDTH, SOKOBAN.WINDOW_HEIGHT))
+        board_pos = ((SOKOBAN.WINDOW_WIDTH - self.board.get_width()) // 2,
+                     (SOKOBAN.WINDOW_HEIGHT - self.board.get_height()) // 2)
+        cells = self.dirty_cells()
+        if cells is None:
+            pygame.draw.rect(self.window, SOKOBAN.WHITE, (0, 0, SOKOBAN.WINDOW_WIDTH, SOKOBAN.WINDOW_HEIGHT))
+            self.level.render(self.board, self.textures)
+            self.player.render(self.board, self.textures)
+            self.window.blit(self.board, board_pos)
+            self.player_interface.render(self.window, self.index_level)
+            self.render_steps()
+            pygame.display.flip()
+        else:
+            rects = []
+            for x, y in cells:
+                self.level.render_cell(self.board, self.textures, x, y)
+            self.player.render(self.board, self.textures)
+            for x, y in cells:
+                area = pygame.Rect(x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE)
+                rects.append(self.window.blit(self.board, area.move(board_pos), area))
+            rects += self.player_interface.render(self.window, self.index_level)
+            rects += self.render_steps(force=False)
+            pygame.display.update(rects)
+        self.drawn_level = self.level
+        self.drawn_player_pos = list(self.player.pos)
+        self.drawn_changes = self.level.journal.changes
+
+    def dirty_cells(self):
+        """
+        Lists the board cells that may have changed since the last frame.
 
-        self.level.render(self.board, self.textures)
-        self.player.render(self.board, self.textures)
+        A move, an undo or a redo shifts the player by one cell and a box by one
+        cell on the same line, so only four cells around the two player positions
+        can change. Several moves since the last frame, such as a turbo playback
+        tick, may have pushed boxes anywhere: the whole window is redrawn.
 
-        pox_x_board = (SOKOBAN.WINDOW_WIDTH / 2) - (self.board.get_width() / 2)
-        pos_y_board = (SOKOBAN.WINDOW_HEIGHT / 2) - (self.board.get_height() / 2)
-        self.window.blit(self.board, (pox_x_board, pos_y_board))
+        Returns:
+            list: The cells (x, y) to redraw, or None if the whole window must be redrawn.
+        """
+        if self.drawn_level is not self.level or self.level.journal.changes - self.drawn_changes > 1:
+            return None
+        (old_x, old_y), (x, y) = self.drawn_player_pos, self.player.pos
+        dx, dy = x - old_x, y - old_y
+        if abs(dx) + abs(dy) > 1:
+            return None
+        cells = {(old_x, old_y), (x, y), (x + dx, y + dy), (old_x - dx, old_y - dy)}
+        return [(cx, cy) for cx, cy in cells
+                if 0 <= cy < len(self.level.structure) and 0 <= cx < len(self.level.structure[cy])]
+
+    def render_steps(self, force=True):
+        """
+        Renders the player's move count in the bottom left corner.
 
-        self.player_interface.render(self.window, self.index_level)
+        Args:
+            force (bool): Render the count even if it is the one already shown.
 
-        # Render player's move count
+        Returns:
+            list: The rectangles of the window that changed, for pygame.display.update.
+        """
         move_count_text = f"Steps: {self.player.move_count}"
-        move_count_surface = self.font_alert.render(move_count_text, True, SOKOBAN.BLACK)
+        if not force and move_count_text == self.steps_text:
+            return []
+        self.steps_text = move_count_text
+        dirty_rects = [self.steps_rect] if self.steps_rect else []
+        if self.steps_rect:
+            self.window.fill(SOKOBAN.WHITE, self.steps_rect)
+        move_count_surface = render_text(self.font_alert, move_count_text, SOKOBAN.BLACK, SOKOBAN.WHITE)
         move_count_position = (20, SOKOBAN.WINDOW_HEIGHT - move_count_surface.get_height() - 20)
-        self.window.blit(move_count_surface, move_count_position)
-
-        pygame.display.flip()
+        self.steps_rect = self.window.blit(move_count_surface, move_count_position)
+        return dirty_rects + [self.steps_rect]
 
     def has_win(self):
         """
@@ -188,19 +248,13 @@ class Game:
         Returns:
             bool: True if the player has won, False otherwise.
         """
-        nb_missing_target = 0
-        for y in range(len(self.level.structure)):
-            for x in range(len(self.level.structure[y])):
-                if self.level.structure[y][x] == SOKOBAN.TARGET:
-                    nb_missing_target += 1
-
-        if nb_missing_target == 0:
-            if self.index_level == 15:
+        if self.level.remaining_targets == 0:
+            if self.pack.extreme_level and self.index_level == self.pack.extreme_level - 1:
                 # Render message and options
                 message = "Congratulations! You have completed all levels!"
                 options = "Press Q to quit the game or press E to play the extreme level."
-                message_surface = self.font_alert.render(message, True, SOKOBAN.RED)
-                options_surface = self.font_alert.render(options, True, SOKOBAN.RED)
+                message_surface = render_text(self.font_alert, message, SOKOBAN.RED)
+                options_surface = render_text(self.font_alert, options, SOKOBAN.RED)
 
                 # Calculate positions to center the text on the screen
                 message_pos = ((SOKOBAN.WINDOW_WIDTH - message_surface.get_width()) // 2,
@@ -221,22 +275,23 @@ class Game:
                             pygame.quit()
                             sys.exit()
                         elif event.key == pygame.K_e:
-                            self.index_level = 16
+                            self.index_level = self.pack.extreme_level
                             self.load_level()
                             break
             else:
                 level_scoreboard = self.get_scoreboard()
-                if self.index_level in level_scoreboard:
-                    if self.player.move_count < level_scoreboard[self.index_level]:
-                        level_scoreboard[self.index_level] = self.player.move_count
+                level_key = self.pack.level_key(self.index_level)
+                if level_key in level_scoreboard:
+                    if self.player.move_count < level_scoreboard[level_key]:
+                        level_scoreboard[level_key] = self.player.move_count
                 else:
-                    level_scoreboard[self.index_level] = self.player.move_count
+                    level_scoreboard[level_key] = self.player.move_count
 
                 # Save the scoreboard
                 self.save_scoreboard(level_scoreboard)
                 self.player.move_count = 0
                 self.index_level += 1
-                if self.index_level == 17:
+                if self.index_level > len(self.pack):
                     self.index_level = 1
                 self.load_level()
         return False
@@ -245,15 +300,15 @@ class Game:
         Retrieves the current scoreboard.
 
         Returns:
-            dict: The current scoreboard where level numbers are keys and minimum steps are values.
+            dict: The current scoreboard where level keys (see LevelPack.level_key) are keys and minimum steps are values.
         """
         scoreboard_file = "assets/scoreboard.txt"
         scoreboard = {}
         if os.path.isfile(scoreboard_file):
             with open(scoreboard_file, 'r') as file:
                 for line in file:
-                    level, steps = line.strip().split(':')
-                    scoreboard[int(level)] = int(steps)
+                    level, steps = line.strip().rsplit(':', 1)
+                    scoreboard[level] = int(steps)
         return scoreboard
 
     def save_scoreboard(self, scoreboard):
@@ -261,7 +316,7 @@ class Game:
         Saves the updated scoreboard.
 
         Args:
-            scoreboard (dict): The updated scoreboard where level numbers are keys and minimum steps are values.
+            scoreboard (dict): The updated scoreboard where level keys are keys and minimum steps are values.
 
         Returns:
             None
@@ -275,23 +330,199 @@ class Game:
         """
         Automatically moves the player based on a pre-calculated strategy.
 
+        The strategy comes from the solution cache, keyed by the current layout,
+        or from the answer file of the level if it still solves the current
+        layout. Otherwise it is computed by a background process and played back
+        from its first solution, see improve_playback.
+
         Returns:
             None
         """
-        answer_dir = "assets/answer"
-        if not os.path.exists(answer_dir):
-            os.makedirs(answer_dir)
-        file_name = f"{answer_dir}/level_{self.index_level}.txt"
-        if os.path.isfile(file_name):
-            with open(file_name, 'r') as file:
-                strategy = file.read().strip().split(", ")
+        if self.solver_process or self.playback:
+            return
+        strategy = self.solution_cache.get(self.level.structure, self.level.position_player, AUTO_METHOD, AUTO_MODE)
+        if strategy is None:
+            strategy = self.read_answer_file()
+        if strategy is not None:
+            self.play_strategy(strategy)
         else:
-            strategy = get_move(self.level.structure, self.level.position_player, 'ucs')
-            with open(file_name, 'w') as file:
-                file.write(', '.join(str(i) for i in strategy))
+            self.start_solver()
 
-        if strategy is not None:
-            try:
-                move_thread = _thread.start_new_thread(move, ("Thread-1", 5, strategy))
-            except:
-                print("Error: unable to start thread")
+    def read_answer_file(self):
+        """
+        Reads the answer file of the current level, as written by the batch solver.
+
+        Returns:
+            list: The moves of the answer file, or None if it is missing or does not solve the current layout.
+        """
+        file_name = f"assets/answer/level_{self.index_level}.txt"
+        if not os.path.isfile(file_name):
+            return None
+        with open(file_name, 'r') as file:
+            strategy = file.read().strip().split(", ")
+        return strategy if engine.replay(self.level.structure, self.level.position_player, strategy) else None
+
+    def play_strategy(self, strategy):
+        """
+        Replays a strategy inside the game loop, feeding its moves to the player
+        on a timer at playback_rate moves per second, or all at once in turbo mode.
+
+        Args:
+            strategy (list): The list of moves to play.
+
+        Returns:
+            None
+        """
+        if not strategy:
+            return
+        self.playback = list(strategy)
+        self.playback_index = 0
+        if self.turbo:
+            pygame.time.set_timer(PLAYBACK_EVENT, 1)
+        else:
+            pygame.time.set_timer(PLAYBACK_EVENT, max(1, round(1000 / self.playback_rate)))
+
+    def improve_playback(self, strategy):
+        """
+        Plays a solution of the background solver, which solves the layout the
+        solver started from.
+
+        The first solution starts the playback. A later, cheaper one replaces the
+        strategy being played: the moves already played that it does not share
+        are undone and the playback goes on with the rest of the new strategy.
+
+        Args:
+            strategy (list): The list of moves of the solution.
+
+        Returns:
+            None
+        """
+        if not strategy:
+            return
+        if not self.playback:
+            self.play_strategy(strategy)
+            return
+        shared = 0
+        while shared < min(self.playback_index, len(strategy)) and self.playback[shared] == strategy[shared]:
+            shared += 1
+        for _ in range(self.playback_index - shared):
+            self.level.cancel_last_move(self.player, self.player_interface)
+        self.playback = list(strategy)
+        self.playback_index = shared
+
+    def play_next_moves(self):
+        """
+        Plays the moves due at this tick of the playback timer: one move, more
+        when the rate exceeds the timer resolution, or up to TURBO_MOVES_PER_FRAME
+        in turbo mode. The screen is rendered once afterwards by the event loop.
+
+        Returns:
+            None
+        """
+        if not self.playback:
+            return
+        if self.turbo:
+            count = TURBO_MOVES_PER_FRAME
+        else:
+            count = max(1, round(self.playback_rate / 1000))
+        for letter in self.playback[self.playback_index:self.playback_index + count]:
+            self.playback_index += 1
+            if self.player.step(letter, self.level, self.player_interface) != letter:
+                print("Error: the strategy does not match the level")
+                self.stop_playback()
+                return
+        if self.playback_index == len(self.playback):
+            self.stop_playback()
+        self.has_win()
+
+    def stop_playback(self):
+        """
+        Stops the playback of a strategy, if any.
+
+        Returns:
+            None
+        """
+        if self.playback:
+            pygame.time.set_timer(PLAYBACK_EVENT, 0)
+        self.playback = []
+        self.playback_index = 0
+
+    def start_solver(self):
+        """
+        Starts solving the current level in a background process.
+
+        The event loop keeps running meanwhile: a timer event polls the process
+        for progress and for the result. The context of the level, built once
+        per level by cachedLevelContext, is handed to the process.
+
+        Returns:
+            None
+        """
+        cells = self.level.solver_cells()
+        level_context = cachedLevelContext(*cells[:3])
+        context = multiprocessing.get_context('spawn')
+        self.solver_connection, sender = context.Pipe(duplex=False)
+        self.solver_process = context.Process(
+            target=backgroundWorker,
+            args=(cells, AUTO_METHOD, AUTO_MODE, sender, AUTO_SECONDS, level_context),
+            daemon=True)
+        self.solver_process.start()
+        sender.close()
+        self.solver_started = time.time()
+        self.solver_expanded = 0
+        self.player_interface.txtSolving = "Solving..."
+        pygame.time.set_timer(SOLVER_EVENT, SOLVER_POLL_MS)
+
+    def poll_solver(self):
+        """
+        Reads the messages of the background solver, updates the progress text
+        and plays back its solutions as they arrive.
+
+        Returns:
+            None
+        """
+        if not self.solver_process:
+            return
+        strategy = None
+        try:
+            while self.solver_connection.poll():
+                kind, value = self.solver_connection.recv()
+                if kind == 'progress':
+                    self.solver_expanded = value
+                elif kind == 'solution':
+                    self.improve_playback(value)
+                else:
+                    strategy = value
+                    break
+        except EOFError:
+            # The process ended without an answer
+            print("Error: the solver stopped unexpectedly")
+            self.cancel_solver()
+            return
+        if strategy is None:
+            elapsed = time.time() - self.solver_started
+            self.player_interface.txtSolving = f"Solving... {self.solver_expanded} states, {elapsed:.1f} s"
+            return
+        solve_time = time.time() - self.solver_started
+        self.cancel_solver()
+        self.solution_cache.put(self.level.structure, self.level.position_player, AUTO_METHOD, AUTO_MODE,
+                                strategy, solve_time)
+        self.improve_playback(strategy)
+
+    def cancel_solver(self):
+        """
+        Stops the background solver, if any, and hides its progress.
+
+        Returns:
+            None
+        """
+        if not self.solver_process:
+            return
+        pygame.time.set_timer(SOLVER_EVENT, 0)
+        if self.solver_process.is_alive():
+            self.solver_process.terminate()
+        self.solver_process.join()
+        self.solver_connection.close()
+        self.solver_process = None
+        self.solver_connection = None
+        self.player_interface.txtSolving = None
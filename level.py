@@ -1,20 +1,28 @@
 import pygame
 import constants as SOKOBAN
-import copy
+import engine
+from level_pack import LevelDirectory
+
+# Tiles drawn once in the static layer of a level; boxes and the player are drawn over it
+STATIC_TILES = (SOKOBAN.WALL, SOKOBAN.TARGET)
 
 class Level:
-    def __init__(self, level_to_load):
+    def __init__(self, level_to_load, journal=None, pack=None):
         """
         Initializes a new Level object.
 
         Args:
             level_to_load (int): The level number to load.
+            journal (MoveJournal): The moves of an earlier play of this level, kept so they can be redone.
+            pack (LevelPack): The pack holding the level, the bundled levels when None.
 
         Returns:
             None
         """
-        self.last_structure_state = None
-        self.last_player_pos = None
+        self.journal = journal if journal is not None else engine.MoveJournal()
+        self.journal.rewind()
+        self.number = level_to_load
+        self.pack = pack if pack is not None else LevelDirectory()
         self.load(level_to_load)
 
     def load(self, level):
@@ -27,32 +35,84 @@ class Level:
         Returns:
             None
         """
-        self.structure = []
-        max_width = 0
-        with open("assets/sokobanLevels/test" + str(level) + ".txt") as level_file:
-            rows = level_file.read().split('\n')
-            for y in range(len(rows)):
-                level_row = []
-                if len(rows[y]) > max_width:
-                    max_width = len(rows[y])
-                for x in range(len(rows[y])):
-                    if rows[y][x] == ' ':
-                        level_row.append(SOKOBAN.AIR)
-                    elif rows[y][x] == '#':
-                        level_row.append(SOKOBAN.WALL)
-                    elif rows[y][x] == 'B':
-                        level_row.append(SOKOBAN.BOX)
-                    elif rows[y][x] == '.':
-                        level_row.append(SOKOBAN.TARGET)
-                    elif rows[y][x] == 'X':
-                        level_row.append(SOKOBAN.TARGET_FILLED)
-                    elif rows[y][x] == '&':
-                        level_row.append(SOKOBAN.AIR)
-                        self.position_player = [x,y]
-                self.structure.append(level_row)
+        self.structure, self.position_player = self.pack.load(level)
+        while self.structure and not self.structure[-1]:
+            self.structure.pop()
+        self.static_layer = None
+        max_width = max(len(row) for row in self.structure)
 
         self.width = max_width * SOKOBAN.SPRITESIZE
-        self.height = (len(rows) - 1) * SOKOBAN.SPRITESIZE
+        self.height = len(self.structure) * SOKOBAN.SPRITESIZE
+        self.index_cells()
+
+    def index_cells(self):
+        """
+        Builds the compact copy of the structure kept for the solver and the win check.
+
+        The grid stores the tiles row by row with a fixed stride, rows padded with
+        walls; a cell is y * stride + x, as in the solver. The walls and goals never
+        change, the box bitmask and the count of empty targets are kept up to date
+        by update_cells after every push.
+
+        Returns:
+            None
+        """
+        self.stride = max(len(row) for row in self.structure)
+        self.grid = bytearray([SOKOBAN.WALL]) * (len(self.structure) * self.stride)
+        for y, row in enumerate(self.structure):
+            self.grid[y * self.stride:y * self.stride + len(row)] = bytes(row)
+        self.walls = bytes(tile == SOKOBAN.WALL for tile in self.grid)
+        self.goal_cells = tuple(cell for cell, tile in enumerate(self.grid) if tile in (SOKOBAN.TARGET, SOKOBAN.TARGET_FILLED))
+        self.box_mask = sum(1 << cell for cell, tile in enumerate(self.grid) if tile in engine.BOXES)
+        self.remaining_targets = self.grid.count(SOKOBAN.TARGET)
+
+    def update_cells(self, x, y, dx, dy):
+        """
+        Copies into the grid the two cells of a push, updating the box bitmask and the count of empty targets.
+
+        Args:
+            x (int): The column of the first cell.
+            y (int): The row of the first cell.
+            dx (int): The column offset of the second cell.
+            dy (int): The row offset of the second cell.
+
+        Returns:
+            None
+        """
+        for cx, cy in ((x, y), (x + dx, y + dy)):
+            cell = cy * self.stride + cx
+            old, new = self.grid[cell], self.structure[cy][cx]
+            self.remaining_targets += (new == SOKOBAN.TARGET) - (old == SOKOBAN.TARGET)
+            if (old in engine.BOXES) != (new in engine.BOXES):
+                self.box_mask ^= 1 << cell
+            self.grid[cell] = new
+
+    def solver_cells(self):
+        """
+        Returns the current state in the form read by solver.solveCells, without any conversion.
+
+        Returns:
+            tuple: The stride, the wall bytes, the goal cells, the player cell and the box bitmask.
+        """
+        player_cell = self.position_player[1] * self.stride + self.position_player[0]
+        return self.stride, self.walls, self.goal_cells, player_cell, self.box_mask
+
+    def play(self, player_pos, direction):
+        """
+        Plays a move of the player and records it in the journal.
+
+        Args:
+            player_pos (list): The position [x, y] of the player.
+            direction (str): The move letter, 'u', 'd', 'l' or 'r'.
+
+        Returns:
+            str: The move played, or None if it is blocked.
+        """
+        move = self.journal.play(self.structure, player_pos, direction)
+        if move and move.isupper():
+            dx, dy = engine.DIRECTIONS[move.lower()]
+            self.update_cells(player_pos[0], player_pos[1], dx, dy)
+        return move
 
     def cancel_last_move(self, player, interface):
         """
@@ -65,14 +125,73 @@ class Level:
         Returns:
             None
         """
-        if self.last_structure_state:
-            self.structure = copy.deepcopy(self.last_structure_state)
-            player.pos = self.last_player_pos
-            interface.colorTxtCancel = SOKOBAN.GREY
-            self.last_structure_state = None
-            self.last_player_pos = None
-        else:
+        move = self.journal.undo(self.structure, player.pos)
+        if not move:
             print("No previous state")
+        elif move.isupper():
+            dx, dy = engine.DIRECTIONS[move.lower()]
+            self.update_cells(player.pos[0] + dx, player.pos[1] + dy, dx, dy)
+        interface.colorTxtCancel = SOKOBAN.BLACK if self.journal.can_undo() else SOKOBAN.GREY
+
+    def redo_last_move(self, player, interface):
+        """
+        Plays again the last move cancelled by the player.
+
+        Args:
+            player (Player): The player object.
+            interface (Interface): The interface object.
+
+        Returns:
+            None
+        """
+        move = self.journal.redo(self.structure, player.pos)
+        if not move:
+            print("No cancelled move")
+        elif move.isupper():
+            dx, dy = engine.DIRECTIONS[move.lower()]
+            self.update_cells(player.pos[0], player.pos[1], dx, dy)
+        interface.colorTxtCancel = SOKOBAN.BLACK if self.journal.can_undo() else SOKOBAN.GREY
+
+    def render_static(self, textures):
+        """
+        Pre-renders the tiles that never change during a level: walls, targets and floor.
+
+        Args:
+            textures (dict): A dictionary mapping level elements to their corresponding textures.
+
+        Returns:
+            None
+        """
+        self.static_layer = pygame.Surface((self.width, self.height))
+        self.static_layer.fill(SOKOBAN.WHITE)
+        for y in range(len(self.structure)):
+            for x in range(len(self.structure[y])):
+                tile = SOKOBAN.TARGET if self.structure[y][x] == SOKOBAN.TARGET_FILLED else self.structure[y][x]
+                if tile in STATIC_TILES and tile in textures:
+                    self.static_layer.blit(textures[tile], (x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE))
+
+    def render_cell(self, window, textures, x, y):
+        """
+        Renders one cell of the level: the static layer below it, then its box if any.
+
+        Args:
+            window (pygame.Surface): The surface to render the cell on.
+            textures (dict): A dictionary mapping level elements to their corresponding textures.
+            x (int): The column of the cell.
+            y (int): The row of the cell.
+
+        Returns:
+            None
+        """
+        rect = (x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE)
+        tile = self.structure[y][x]
+        if tile not in engine.BOXES:
+            window.blit(self.static_layer, rect[:2], area=rect)
+        elif tile in textures:
+            pygame.draw.rect(window, SOKOBAN.WHITE, rect)
+            window.blit(textures[tile], rect[:2])
+        else:
+            pygame.draw.rect(window, (0,255,0), rect)
 
     def render(self, window, textures):
         """
@@ -85,12 +204,10 @@ class Level:
         Returns:
             None
         """
+        if self.static_layer is None:
+            self.render_static(textures)
+        window.blit(self.static_layer, (0, 0))
         for y in range(len(self.structure)):
             for x in range(len(self.structure[y])):
-                if self.structure[y][x] in textures:
-                    window.blit(textures[self.structure[y][x]], (x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE))
-                else:
-                    if self.structure[y][x] == SOKOBAN.TARGET_FILLED:
-                        pygame.draw.rect(window, (0,255,0), (x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE))
-                    else:
-                        pygame.draw.rect(window, SOKOBAN.WHITE, (x * SOKOBAN.SPRITESIZE, y * SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE, SOKOBAN.SPRITESIZE))
+                if self.structure[y][x] in engine.BOXES:
+                    self.render_cell(window, textures, x, y)
@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import mmap
+import engine
+
+BUNDLED_LEVELS = "assets/sokobanLevels"
+BUNDLED_FIRST_LEVEL = 13 # level a new game of the bundled levels starts at
+
+# Characters of a map row, in the standard XSB alphabet and in the alphabet of the bundled level files
+MAP_CHARS = frozenset(engine.TILES) | frozenset(engine.PLAYER_CHARS)
+
+
+def is_map_line(line):
+    """
+    Checks if a line of a pack file is a row of a level map.
+
+    Titles, comments and blank lines separate the levels of a pack.
+
+    Args:
+        line (str): The line, without its line break.
+
+    Returns:
+        bool: True if the line is a map row, False otherwise.
+    """
+    return '#' in line and all(char in MAP_CHARS for char in line)
+
+
+class LevelPack:
+    def __init__(self, path):
+        """
+        Initializes a new LevelPack object.
+
+        A pack is a text file holding any number of levels in the XSB format
+        (# wall, $ box, . goal, * box on goal, @ player, + player on goal, space,
+        - or _ floor), or in the format of the bundled level files. The byte range
+        of every level is indexed once and saved next to the pack as path.idx;
+        the file is memory-mapped so a level is parsed only when it is loaded.
+        A pack is played from its first level and has no extreme level.
+
+        Args:
+            path (str): The pack file.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        self.offsets = self.read_index()
+        self.first_level = 1
+        self.extreme_level = None
+
+    def __len__(self):
+        """
+        Returns the number of levels of the pack.
+
+        Returns:
+            int: The number of levels.
+        """
+        return len(self.offsets) // 2
+
+    def index_file_name(self):
+        """
+        Returns the path of the index file of the pack.
+
+        Returns:
+            str: The index file path.
+        """
+        return self.path + '.idx'
+
+    def read_index(self):
+        """
+        Reads the saved index of the pack, or builds and saves it when it is missing or stale.
+
+        Returns:
+            list: The start and end byte offsets of the levels, flattened.
+        """
+        stat = os.stat(self.path)
+        try:
+            with open(self.index_file_name(), 'r') as file:
+                index = json.load(file)
+            if index['size'] == stat.st_size and index['mtime'] == stat.st_mtime_ns:
+                return index['offsets']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        offsets = self.build_index()
+        try:
+            temporary_name = self.index_file_name() + '.tmp'
+            with open(temporary_name, 'w') as file:
+                json.dump({'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'offsets': offsets}, file)
+            os.replace(temporary_name, self.index_file_name())
+        except OSError:
+            pass # a read-only pack is indexed again on every start
+        return offsets
+
+    def build_index(self):
+        """
+        Scans the pack once for the byte ranges of its levels.
+
+        Returns:
+            list: The start and end byte offsets of the levels, flattened.
+        """
+        offsets = []
+        position = 0
+        start = None
+        for line in iter(self.data.readline, b'') if self.data else []:
+            if is_map_line(line.rstrip(b'\r\n').decode('utf-8', 'replace')):
+                if start is None:
+                    start = position
+            elif start is not None:
+                offsets += [start, position]
+                start = None
+            position += len(line)
+        if start is not None:
+            offsets += [start, position]
+        return offsets
+
+    def load(self, number):
+        """
+        Parses one level of the pack.
+
+        Args:
+            number (int): The level number, starting at 1.
+
+        Returns:
+            tuple: The structure and the position [x, y] of the player, as returned by engine.parse_level.
+        """
+        if not 1 <= number <= len(self):
+            raise IndexError(f"level {number} is not in {self.path}")
+        start, end = self.offsets[2 * number - 2], self.offsets[2 * number - 1]
+        rows = self.data[start:end].decode('utf-8').splitlines()
+        return engine.parse_level(rows)
+
+    def level_key(self, number):
+        """
+        Returns the key of a level of the pack in the scoreboard.
+
+        Args:
+            number (int): The level number, starting at 1.
+
+        Returns:
+            str: The absolute path of the pack and the level number, as path#number.
+        """
+        return f"{os.path.abspath(self.path)}#{number}"
+
+    def close(self):
+        """
+        Releases the memory map and the file.
+
+        Returns:
+            None
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+class LevelDirectory:
+    def __init__(self, directory=BUNDLED_LEVELS):
+        """
+        Initializes a new LevelDirectory object, the pack of the bundled levels,
+        stored one per file as testN.txt.
+
+        The bundled levels start at BUNDLED_FIRST_LEVEL and their last level is
+        the extreme level, offered once the others are completed. Any other
+        directory is played from its first level, like a pack file.
+
+        Args:
+            directory (str): The directory of the level files.
+
+        Returns:
+            None
+        """
+        self.directory = directory
+        self.count = sum(1 for name in os.listdir(directory) if re.fullmatch(r'test\d+\.txt', name))
+        if os.path.abspath(directory) == os.path.abspath(BUNDLED_LEVELS):
+            self.first_level = min(BUNDLED_FIRST_LEVEL, self.count)
+            self.extreme_level = self.count
+        else:
+            self.first_level = 1
+            self.extreme_level = None
+
+    def __len__(self):
+        """
+        Returns the number of level files.
+
+        Returns:
+            int: The number of levels.
+        """
+        return self.count
+
+    def load(self, number):
+        """
+        Parses one level file.
+
+        Args:
+            number (int): The level number, starting at 1.
+
+        Returns:
+            tuple: The structure and the position [x, y] of the player, as returned by engine.parse_level.
+        """
+        return engine.load_level(os.path.join(self.directory, f"test{number}.txt"))
+
+    def level_key(self, number):
+        """
+        Returns the key of a level file in the scoreboard, its bare number as for the bundled levels.
+
+        Args:
+            number (int): The level number, starting at 1.
+
+        Returns:
+            str: The level number.
+        """
+        return str(number)
+
+
+def level_label(key):
+    """
+    Returns the name of a scoreboard key shown to the player.
+
+    Args:
+        key (str): The key, as returned by level_key.
+
+    Returns:
+        str: The level number, preceded by the pack file name for a pack level.
+    """
+    path, _, number = key.rpartition('#')
+    return f"{os.path.basename(path)} {number}" if path else number
+
+
+def open_pack(path):
+    """
+    Opens a directory of level files or a pack file.
+
+    Args:
+        path (str): The directory or the pack file.
+
+    Returns:
+        LevelDirectory or LevelPack: The pack.
+    """
+    return LevelDirectory(path) if os.path.isdir(path) else LevelPack(path)
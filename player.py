@@ -1,7 +1,10 @@
 import pygame
 from pygame.locals import *
 import constants as SOKOBAN
-from copy import deepcopy
+import engine
+
+# Move letter of each movement key
+KEY_DIRECTIONS = {K_UP: 'u', K_w: 'u', K_DOWN: 'd', K_s: 'd', K_LEFT: 'l', K_a: 'l', K_RIGHT: 'r', K_d: 'r'}
 
 class Player:
     def __init__(self, level):
@@ -30,101 +33,29 @@ class Player:
         Returns:
             None
         """
-        x = self.pos[0]
-        y = self.pos[1]
-
-        levelHasChanged = False
-        previous_level_structure = deepcopy(level.structure)
-        previous_player_pos = [x,y]
-
-        if direction == K_LEFT or direction == K_a:
-            self.direction = SOKOBAN.LEFT
-            if x > 0 and level.structure[y][x - 1] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                self.pos[0] -= 1
-            elif x > 1 and level.structure[y][x - 1] in [SOKOBAN.BOX, SOKOBAN.TARGET_FILLED] and level.structure[y][x - 2] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                levelHasChanged = True
-                if level.structure[y][x - 1] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y][x - 1] = SOKOBAN.TARGET
-                else:
-                    level.structure[y][x - 1] = SOKOBAN.AIR
-
-                if level.structure[y][x - 2] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y][x - 2] = SOKOBAN.TARGET
-                elif level.structure[y][x - 2] == SOKOBAN.TARGET:
-                    level.structure[y][x - 2] = SOKOBAN.TARGET_FILLED
-                else:
-                    level.structure[y][x - 2] = SOKOBAN.BOX
-
-                self.pos[0] -= 1
-            self.move_count += 1
-
-        if direction == K_RIGHT or direction == K_d:
-            self.direction = SOKOBAN.RIGHT
-            if level.structure[y][x + 1] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                self.pos[0] += 1
-            elif level.structure[y][x + 1] in [SOKOBAN.BOX, SOKOBAN.TARGET_FILLED] and level.structure[y][x + 2] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                levelHasChanged = True
-                if level.structure[y][x + 1] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y][x + 1] = SOKOBAN.TARGET
-                else:
-                    level.structure[y][x + 1] = SOKOBAN.AIR
-
-                if level.structure[y][x + 2] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y][x + 2] = SOKOBAN.TARGET
-                elif level.structure[y][x + 2] == SOKOBAN.TARGET:
-                    level.structure[y][x + 2] = SOKOBAN.TARGET_FILLED
-                else:
-                    level.structure[y][x + 2] = SOKOBAN.BOX
-
-                self.pos[0] += 1
-            self.move_count += 1
+        letter = KEY_DIRECTIONS.get(direction)
+        if letter is not None:
+            self.step(letter, level, interface)
 
-        if direction == K_UP or direction == K_w:
-            self.direction = SOKOBAN.UP
-            if y > 0 and level.structure[y - 1][x] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                self.pos[1] -= 1
-            elif y > 1 and level.structure[y - 1][x] in [SOKOBAN.BOX, SOKOBAN.TARGET_FILLED] and level.structure[y - 2][x] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                levelHasChanged = True
-                if level.structure[y - 1][x] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y - 1][x] = SOKOBAN.TARGET
-                else:
-                    level.structure[y - 1][x] = SOKOBAN.AIR
-
-                if level.structure[y - 2][x] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y - 2][x] = SOKOBAN.TARGET
-                elif level.structure[y - 2][x] == SOKOBAN.TARGET:
-                    level.structure[y - 2][x] = SOKOBAN.TARGET_FILLED
-                else:
-                    level.structure[y - 2][x] = SOKOBAN.BOX
-
-                self.pos[1] -= 1
-            self.move_count += 1
-            
-        if direction == K_DOWN or direction == K_s:
-            self.direction = SOKOBAN.DOWN
-            if level.structure[y + 1][x] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                self.pos[1] += 1
-            elif level.structure[y + 1][x] in [SOKOBAN.BOX, SOKOBAN.TARGET_FILLED] and level.structure[y + 2][x] in [SOKOBAN.AIR, SOKOBAN.TARGET]:
-                levelHasChanged = True
-                if level.structure[y + 1][x] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y + 1][x] = SOKOBAN.TARGET
-                else:
-                    level.structure[y + 1][x] = SOKOBAN.AIR
+    def step(self, letter, level, interface):
+        """
+        Moves the player by one move letter.
 
-                if level.structure[y + 2][x] == SOKOBAN.TARGET_FILLED:
-                    level.structure[y + 2][x] = SOKOBAN.TARGET
-                elif level.structure[y + 2][x] == SOKOBAN.TARGET:
-                    level.structure[y + 2][x] = SOKOBAN.TARGET_FILLED
-                else:
-                    level.structure[y + 2][x] = SOKOBAN.BOX
+        Args:
+            letter (str): The move letter, 'u', 'd', 'l' or 'r' in either case.
+            level (Level): The level object.
+            interface (PlayerInterface): The player interface object.
 
-                self.pos[1] += 1
-            self.move_count += 1
-            
-        if levelHasChanged:
-            level.last_structure_state = previous_level_structure
-            level.last_player_pos = previous_player_pos
+        Returns:
+            str: The move played, upper case for a push, or None if it is blocked.
+        """
+        letter = letter.lower()
+        self.direction = engine.FACINGS[letter]
+        move = level.play(self.pos, letter)
+        if move:
             interface.colorTxtCancel = SOKOBAN.BLACK
+        self.move_count += 1
+        return move
 
     def render(self, window, textures):
         """
@@ -1,5 +1,6 @@
 import pygame
 import constants as SOKOBAN
+from text_cache import render_text
 
 class PlayerInterface:
     def __init__(self, player, level):
@@ -25,6 +26,12 @@ class PlayerInterface:
         self.colorTxtReset = SOKOBAN.BLACK
         self.txtAuto = "Auto"
         self.colorTxtAuto = SOKOBAN.BLACK
+        self.txtSolving = None
+        self.txtCancelSolving = "Cancel solving"
+        # The cancel label never changes: laid out once, so a click can be tested before the first render
+        self.txtCancelSolvingSurface = render_text(self.font_menu, self.txtCancelSolving, SOKOBAN.RED, SOKOBAN.WHITE)
+        self.posTxtCancelSolving = ((SOKOBAN.WINDOW_WIDTH - self.txtCancelSolvingSurface.get_width()) - 10, 70)
+        self.drawn_rects = []
 
     def click(self, pos_click, level, game):
         """
@@ -41,16 +48,19 @@ class PlayerInterface:
         x = pos_click[0]
         y = pos_click[1]
 
-        if x > self.posTxtCancel[0] and x < self.posTxtCancel[0] + self.txtCancelSurface.get_width() \
+        if self.txtSolving and x > self.posTxtCancelSolving[0] and x < self.posTxtCancelSolving[0] + self.txtCancelSolvingSurface.get_width() \
+        and y > self.posTxtCancelSolving[1] and y < self.posTxtCancelSolving[1] + self.txtCancelSolvingSurface.get_height():
+            game.cancel_solver()
+
+        elif not self.txtSolving and not game.playback and x > self.posTxtCancel[0] and x < self.posTxtCancel[0] + self.txtCancelSurface.get_width() \
          and y > self.posTxtCancel[1] and y < self.posTxtCancel[1] + self.txtCancelSurface.get_height():
             level.cancel_last_move(self.player, self)
-            self.colorTxtCancel = SOKOBAN.GREY
         
-        if x > self.posTxtReset[0] and x < self.posTxtReset[0] + self.txtResetSurface.get_width() \
+        elif x > self.posTxtReset[0] and x < self.posTxtReset[0] + self.txtResetSurface.get_width() \
         and y > self.posTxtReset[1] and y < self.posTxtReset[1] + self.txtResetSurface.get_height():
             game.load_level()
             
-        if x > self.posTxtAuto[0] and x < self.posTxtAuto[0] + self.txtAutoSurface.get_width() \
+        elif x > self.posTxtAuto[0] and x < self.posTxtAuto[0] + self.txtAutoSurface.get_width() \
         and y > self.posTxtAuto[1] and y < self.posTxtAuto[1] + self.txtAutoSurface.get_height():
             game.auto_move()
                 
@@ -63,20 +73,35 @@ class PlayerInterface:
             level (int): The current level number.
 
         Returns:
-            None
+            list: The rectangles of the window that changed, for pygame.display.update.
         """
+        # Clear the labels of the previous frame, whose text may have been longer
+        dirty_rects = list(self.drawn_rects)
+        for rect in self.drawn_rects:
+            window.fill(SOKOBAN.WHITE, rect)
+        self.drawn_rects = []
+
         self.txtLevel = "Level " + str(level)
-        self.txtLevelSurface = self.font_menu.render(self.txtLevel, True, self.colorTxtLevel, SOKOBAN.WHITE)
-        window.blit(self.txtLevelSurface, (10, 10))
+        self.txtLevelSurface = render_text(self.font_menu, self.txtLevel, self.colorTxtLevel, SOKOBAN.WHITE)
+        self.drawn_rects.append(window.blit(self.txtLevelSurface, (10, 10)))
 
-        self.txtCancelSurface = self.font_menu.render(self.txtCancel, True, self.colorTxtCancel, SOKOBAN.WHITE)
+        self.txtCancelSurface = render_text(self.font_menu, self.txtCancel, self.colorTxtCancel, SOKOBAN.WHITE)
         self.posTxtCancel = (SOKOBAN.WINDOW_WIDTH - self.txtCancelSurface.get_width() - 10, 10)
-        window.blit(self.txtCancelSurface, self.posTxtCancel)
+        self.drawn_rects.append(window.blit(self.txtCancelSurface, self.posTxtCancel))
 
-        self.txtResetSurface = self.font_menu.render(self.txtReset, True, self.colorTxtReset, SOKOBAN.WHITE)
+        self.txtResetSurface = render_text(self.font_menu, self.txtReset, self.colorTxtReset, SOKOBAN.WHITE)
         self.posTxtReset = ((SOKOBAN.WINDOW_WIDTH / 2) - (self.txtResetSurface.get_width() / 2), 10)
-        window.blit(self.txtResetSurface, self.posTxtReset)
+        self.drawn_rects.append(window.blit(self.txtResetSurface, self.posTxtReset))
 
-        self.txtAutoSurface = self.font_menu.render(self.txtAuto, True, self.colorTxtAuto, SOKOBAN.WHITE)
+        self.txtAutoSurface = render_text(self.font_menu, self.txtAuto, self.colorTxtAuto, SOKOBAN.WHITE)
         self.posTxtAuto = ((SOKOBAN.WINDOW_WIDTH - self.txtAutoSurface.get_width()) - 10, 30)
-        window.blit(self.txtAutoSurface, self.posTxtAuto)
+        self.drawn_rects.append(window.blit(self.txtAutoSurface, self.posTxtAuto))
+
+        if self.txtSolving:
+            self.txtSolvingSurface = render_text(self.font_menu, self.txtSolving, SOKOBAN.BLACK, SOKOBAN.WHITE)
+            self.posTxtSolving = ((SOKOBAN.WINDOW_WIDTH - self.txtSolvingSurface.get_width()) - 10, 50)
+            self.drawn_rects.append(window.blit(self.txtSolvingSurface, self.posTxtSolving))
+
+            self.drawn_rects.append(window.blit(self.txtCancelSolvingSurface, self.posTxtCancelSolving))
+
+        return dirty_rects + self.drawn_rects
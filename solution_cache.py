@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import collections
+import numpy as np
+import constants as SOKOBAN
+import engine
+
+
+def layout_key(layout, player_pos, method, mode):
+    """
+    Computes the cache key of a level for a solver configuration.
+
+    The layout is normalized by cropping it to the bounding box of its non-wall
+    cells, so padding rows and columns do not change the key. The method and mode
+    are part of the key because they select the cost model of the solution.
+
+    Args:
+        layout (list): The level structure.
+        player_pos (list): The position [x, y] of the player.
+        method (str): The solver method.
+        mode (str): The solver mode.
+
+    Returns:
+        str: The hexadecimal key.
+    """
+    grid = np.full((len(layout), max(len(row) for row in layout)), SOKOBAN.WALL, dtype=np.uint8)
+    for y, row in enumerate(layout):
+        grid[y, :len(row)] = row
+    rows, columns = np.nonzero(grid != SOKOBAN.WALL)
+    top, left = rows.min(), columns.min()
+    cropped = grid[top:rows.max() + 1, left:columns.max() + 1]
+    digest = hashlib.sha1()
+    digest.update(f"{cropped.shape[0]}x{cropped.shape[1]}:{player_pos[0] - left},{player_pos[1] - top}:{method}:{mode}:".encode())
+    digest.update(cropped.tobytes())
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    def __init__(self, directory="assets/answer/cache", max_entries=64):
+        """
+        Initializes a new SolutionCache object.
+
+        Solutions are stored on disk as one JSON file per key, behind an in-memory
+        LRU of the entries already validated.
+
+        Args:
+            directory (str): The directory holding the cached solutions.
+            max_entries (int): The number of entries kept in memory.
+
+        Returns:
+            None
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def get(self, layout, player_pos, method, mode='moves'):
+        """
+        Looks up the solution of a level.
+
+        A solution read from disk is replayed on the level before it is used; an
+        invalid file is deleted.
+
+        Args:
+            layout (list): The level structure.
+            player_pos (list): The position [x, y] of the player.
+            method (str): The solver method.
+            mode (str): The solver mode.
+
+        Returns:
+            list: The moves solving the level, or None if none is cached.
+        """
+        key = layout_key(layout, player_pos, method, mode)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return list(self.entries[key]['moves'])
+
+        file_name = self.file_name(key)
+        if not os.path.isfile(file_name):
+            return None
+        try:
+            with open(file_name, 'r') as file:
+                entry = json.load(file)
+            valid = engine.replay(layout, player_pos, entry['moves'])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            valid = False
+        if not valid:
+            os.remove(file_name)
+            return None
+        self.remember(key, entry)
+        return list(entry['moves'])
+
+    def put(self, layout, player_pos, method, mode, moves, solve_time=None):
+        """
+        Stores the solution of a level after checking that it solves the level.
+
+        Args:
+            layout (list): The level structure.
+            player_pos (list): The position [x, y] of the player.
+            method (str): The solver method.
+            mode (str): The solver mode.
+            moves (list): The moves solving the level.
+            solve_time (float): The seconds spent by the solver.
+
+        Returns:
+            bool: True if the solution was valid and stored, False otherwise.
+        """
+        if not engine.replay(layout, player_pos, moves):
+            return False
+        key = layout_key(layout, player_pos, method, mode)
+        entry = {
+            'moves': ''.join(moves),
+            'length': len(moves),
+            'pushes': sum(1 for move in moves if move.isupper()),
+            'solve_time': solve_time,
+            'method': method,
+            'mode': mode,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_name = self.file_name(key) + '.tmp'
+        with open(temporary_name, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temporary_name, self.file_name(key))
+        self.remember(key, entry)
+        return True
+
+    def remember(self, key, entry):
+        """
+        Adds a validated entry to the in-memory LRU, evicting the oldest one when full.
+
+        Args:
+            key (str): The cache key.
+            entry (dict): The cached solution and its metadata.
+
+        Returns:
+            None
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def file_name(self, key):
+        """
+        Returns the path of the file storing a key.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: The file path.
+        """
+        return os.path.join(self.directory, key + '.json')
@@ -1,10 +1,22 @@
 import sys
+import os
+import re
+import argparse
 import collections
+import multiprocessing
+import multiprocessing.connection
 import numpy as np
 import heapq
 import time
 import numpy as np
-global posWalls, posGoals
+import functools
+import random
+import engine
+from array import array
+try:
+    import resource # POSIX only, used to cap the memory of batch workers
+except ImportError:
+    resource = None
 class PriorityQueue:
     """Define a PriorityQueue data structure that will be used"""
     def  __init__(self):
@@ -24,6 +36,163 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.Heap) == 0
 
+PROGRESS_INTERVAL = 1000 # expansions between two calls of the stats callback
+SEARCH_NODE_BYTES = 200 # approximate memory of one frontier or explored state, for memory budgets
+
+class BudgetExceeded(Exception):
+    """Raised inside a search when its SearchBudget runs out"""
+
+class SearchBudget:
+    """Limits of a search: wall-clock seconds, expansions and estimated memory in bytes of the frontier
+    and explored states; None leaves a limit unset. The clock starts when the budget is created"""
+    __slots__ = ('deadline', 'expansions', 'memory')
+
+    def __init__(self, seconds=None, expansions=None, memory=None):
+        self.deadline = time.perf_counter() + seconds if seconds is not None else None
+        self.expansions = expansions
+        self.memory = memory
+
+    def check(self, stats, frontierSize, exploredSize):
+        """Raise BudgetExceeded when a limit is reached"""
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise BudgetExceeded('time')
+        if self.expansions is not None and stats.expanded >= self.expansions:
+            raise BudgetExceeded('expansions')
+        if self.memory is not None and (frontierSize + exploredSize) * SEARCH_NODE_BYTES >= self.memory:
+            raise BudgetExceeded('memory')
+
+class SearchStats:
+    """Counters filled in by a search. With timePhases the time spent generating legal moves, updating
+    states, hashing, checking deadlocks and evaluating the heuristic is measured too, at some cost;
+    callback, if given, is called with the stats every interval expansions; budget, if given, is a
+    SearchBudget checked at every expansion, and stopped names the limit that ended the search"""
+    PHASES = ('legal', 'corral', 'update', 'hashing', 'deadlock', 'heuristic')
+    __slots__ = ('expanded', 'generated', 'duplicates', 'pruned', 'corralPruned', 'deadEnds', 'bounded', 'peakFrontier',
+                 'peakExplored', 'phaseTimes', 'timePhases', 'callback', 'interval', 'started', 'budget', 'stopped')
+
+    def __init__(self, callback=None, interval=PROGRESS_INTERVAL, timePhases=False, budget=None):
+        self.expanded = 0 # states taken from the frontier and expanded
+        self.generated = 0 # children added to the frontier
+        self.duplicates = 0 # states skipped because they were already explored
+        self.pruned = 0 # children rejected by isFailed
+        self.corralPruned = 0 # pushes dropped by the PI-corral pruning of the push searches, corral deadlocks included
+        self.deadEnds = 0 # children rejected because the heuristic found a box cut off from every goal
+        self.bounded = 0 # children rejected because they cannot beat the bound of the search, the best solution of 'anytime'
+        self.peakFrontier = 0
+        self.peakExplored = 0
+        self.phaseTimes = dict.fromkeys(self.PHASES, 0.0)
+        self.timePhases = timePhases
+        self.callback = callback
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.budget = budget
+        self.stopped = None
+
+    def expand(self, frontierSize, exploredSize):
+        """Count an expansion, track the peak sizes and call the callback when it is due"""
+        self.expanded += 1
+        if frontierSize > self.peakFrontier:
+            self.peakFrontier = frontierSize
+        if exploredSize > self.peakExplored:
+            self.peakExplored = exploredSize
+        if self.callback and self.expanded % self.interval == 0:
+            self.callback(self)
+        if self.budget is not None:
+            self.budget.check(self, frontierSize, exploredSize)
+
+    def elapsed(self):
+        """Return the seconds since the stats were created"""
+        return time.perf_counter() - self.started
+
+    def asDict(self):
+        """Return the counters, peaks and phase times as a plain dictionary"""
+        values = {name: getattr(self, name) for name in ('expanded', 'generated', 'duplicates', 'pruned', 'corralPruned', 'deadEnds',
+                                                         'bounded', 'peakFrontier', 'peakExplored')}
+        if self.timePhases:
+            values['phaseTimes'] = dict(self.phaseTimes)
+        if self.stopped:
+            values['stopped'] = self.stopped
+        return values
+
+    def report(self):
+        """Return a human readable summary, with the share of the elapsed time taken by each phase"""
+        elapsed = self.elapsed()
+        lines = ['%-13s %s' % (name, value) for name, value in self.asDict().items() if name != 'phaseTimes']
+        lines.append('%-13s %.3f s' % ('elapsed', elapsed))
+        if self.timePhases:
+            for phase in self.PHASES:
+                seconds = self.phaseTimes[phase]
+                lines.append('  %-11s %.3f s (%4.1f%%)' % (phase, seconds, 100 * seconds / elapsed if elapsed else 0))
+        return '\n'.join(lines)
+
+ZOBRIST_SEED = 20240511 # fixed so that hashes, and therefore searches, are reproducible
+TABLE_ENTRY_BYTES = 64 # approximate memory of one hash stored in a set
+
+class TranspositionTable:
+    """Set of the Zobrist hashes of explored states, holding at most maxBytes worth of entries.
+    When full, the 'generational' policy forgets the older half of the entries and the 'keep'
+    policy stops recording new ones; a forgotten state may be explored again but memory stays bounded"""
+    __slots__ = ('current', 'previous', 'capacity', 'policy', 'evictions')
+
+    def __init__(self, maxBytes=256 * 1024 * 1024, policy='generational'):
+        if policy not in ('generational', 'keep'):
+            raise ValueError('Invalid replacement policy.')
+        self.current = set()
+        self.previous = set() # older generation, still consulted until it is dropped
+        self.capacity = max(2, maxBytes // TABLE_ENTRY_BYTES)
+        self.policy = policy
+        self.evictions = 0
+
+    def __contains__(self, hash):
+        return hash in self.current or hash in self.previous
+
+    def __len__(self):
+        return len(self.current) + len(self.previous)
+
+    def add(self, hash):
+        """Record an explored state, making room according to the replacement policy"""
+        if len(self.current) + len(self.previous) >= self.capacity:
+            if self.policy == 'keep':
+                return
+            self.evictions += len(self.previous)
+            self.previous = self.current
+            self.current = set()
+        self.current.add(hash)
+
+class SearchTree:
+    """Store search nodes as parallel arrays, each node pointing at its parent by index"""
+    __slots__ = ('parent', 'move', 'player', 'boxes', 'cost', 'hash')
+
+    def __init__(self):
+        self.parent = array('l') # index of the parent node, -1 for the root
+        self.move = bytearray() # letter of the action leading to the node
+        self.player = array('l') # cell of the player
+        self.boxes = [] # bitmask of the boxes
+        self.cost = array('l') # cost of the path from the root
+        self.hash = array('Q') # Zobrist hash, of the whole state or of the boxes only depending on the search
+
+    def add(self, parent, move, player, boxes, cost, hash):
+        """Append a node and return its index"""
+        self.parent.append(parent)
+        self.move.append(ord(move))
+        self.player.append(player)
+        self.boxes.append(boxes)
+        self.cost.append(cost)
+        self.hash.append(hash)
+        return len(self.parent) - 1
+
+    def lineage(self, node):
+        """Return the nodes from the root down to the given node"""
+        nodes = [node]
+        while self.parent[node] >= 0:
+            node = self.parent[node]
+            nodes.append(node)
+        return nodes[::-1]
+
+    def path(self, node):
+        """Return the actions leading from the root to the given node"""
+        return [chr(self.move[child]) for child in self.lineage(node)[1:]]
+
 """Load puzzles and define the rules of sokoban"""
 
 def transferToGameState(layout):
@@ -44,20 +213,22 @@ def transferToGameState(layout):
         if colsNum < maxColsNum:
             layout[irow].extend([1 for _ in range(maxColsNum-colsNum)]) 
     return np.array(layout)
+PLAYER_ON_GOAL = 6 # game state code of the player standing on a goal, which stays a goal
+
 def transferToGameState2(layout, player_pos):
     """Transfer the layout of initial puzzle"""
     maxColsNum = max([len(x) for x in layout])
-    temp = np.ones((len(layout), maxColsNum))
+    temp = np.ones((len(layout), maxColsNum), dtype=np.uint8)
     for i, row in enumerate(layout):
-        for j, val in enumerate(row):
-            temp[i][j] = layout[i][j]
+        temp[i, :len(row)] = row
 
-    temp[player_pos[1]][player_pos[0]] = 2
+    x, y = player_pos
+    temp[y][x] = PLAYER_ON_GOAL if temp[y][x] == 4 else 2
     return temp
 
 def PosOfPlayer(gameState):
     """Return the position of agent"""
-    return tuple(np.argwhere(gameState == 2)[0])
+    return tuple(np.argwhere((gameState == 2) | (gameState == PLAYER_ON_GOAL))[0])
 
 def PosOfBoxes(gameState):
     """Return the positions of boxes"""
@@ -69,117 +240,1139 @@ def PosOfWalls(gameState):
 
 def PosOfGoals(gameState):
     """Return the positions of goals"""
-    return tuple(tuple(x) for x in np.argwhere((gameState == 4) | (gameState == 5)))
+    return tuple(tuple(x) for x in np.argwhere((gameState == 4) | (gameState == 5) | (gameState == PLAYER_ON_GOAL)))
+
+class LevelContext:
+    """Hold the static data of a level read by the rule functions: walls, goals and precomputed tables.
+    A context is never modified once built, except for the macro tables filled in on first use with values
+    that only depend on the level, so one instance can serve any number of concurrent solves"""
+    def __init__(self, mapWidth, walls, goals):
+        self.mapWidth = mapWidth
+        self.wallCells = bytes(walls) # 1 for every wall cell, indexed like the cells
+        self.goalCells = sorted(goals)
+        self.goalMask = sum(1 << goal for goal in self.goalCells)
+        self.allActions = tuple((dy * mapWidth + dx, move, move.upper()) for move, (dx, dy) in engine.DIRECTIONS.items())
+        keys = random.Random(ZOBRIST_SEED)
+        self.boxKeys = [keys.getrandbits(64) for _ in range(len(walls))] # Zobrist key of a box on each cell
+        self.playerKeys = [keys.getrandbits(64) for _ in range(len(walls))] # Zobrist key of the player on each cell
+        self.pushDistances = computePushDistances(self)
+        self.deadCells = bytes(computeDeadCells(self))
+
+    @functools.cached_property
+    def tunnels(self):
+        """The tunnels of the level, see computeTunnels; built on first use, by the push search only"""
+        return computeTunnels(self)
+
+    @functools.cached_property
+    def goalRooms(self):
+        """The goal rooms of the level, see computeGoalRooms; built on first use, by the push search only"""
+        return computeGoalRooms(self)
+
+@functools.lru_cache(maxsize=32)
+def cachedLevelContext(mapWidth, walls, goals):
+    """Build the context of a level once and reuse it for later solves of the same level"""
+    return LevelContext(mapWidth, walls, goals)
 
-def isEndState(posBox):
+def getLevelContext(gameState):
+    """Return the context of the level described by gameState"""
+    mapWidth = gameState.shape[1]
+    walls = bytes((gameState == 1).ravel().tolist())
+    goals = tuple(int(x) * mapWidth + int(y) for x, y in PosOfGoals(gameState))
+    return cachedLevelContext(mapWidth, walls, goals)
+
+"""Compact state encoding: a cell (x, y) is stored as the index x * mapWidth + y
+and a set of boxes as an integer bitmask with one bit per cell"""
+
+def cellOf(ctx, pos):
+    """Return the cell index of a (row, column) position"""
+    return int(pos[0]) * ctx.mapWidth + int(pos[1])
+
+def posOf(ctx, cell):
+    """Return the (row, column) position of a cell index"""
+    return divmod(cell, ctx.mapWidth)
+
+def cellsOf(mask):
+    """Return the cell indices of the bits set in a bitmask, in increasing order"""
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+def zobristHash(ctx, posPlayer, boxMask):
+    """Return the Zobrist hash of a state from scratch; searches then update it incrementally.
+    posPlayer may be None to hash the boxes only"""
+    hash = ctx.playerKeys[posPlayer] if posPlayer is not None else 0
+    for box in cellsOf(boxMask):
+        hash ^= ctx.boxKeys[box]
+    return hash
+
+def encodeBoxes(ctx, posBox):
+    """Return the bitmask of the given box positions"""
+    mask = 0
+    for box in posBox:
+        mask |= 1 << cellOf(ctx, box)
+    return mask
+
+def decodeBoxes(ctx, boxMask):
+    """Return the sorted positions of the boxes in a bitmask"""
+    return tuple(posOf(ctx, cell) for cell in cellsOf(boxMask))
+
+def isEndState(ctx, boxMask):
     """Check if all boxes are on the goals (i.e. pass the game)"""
-    return sorted(posBox) == sorted(posGoals)
+    return boxMask == ctx.goalMask
 
-def isLegalAction(action, posPlayer, posBox):
+def isLegalAction(ctx, action, posPlayer, boxMask):
     """Check if the given action is legal"""
-    xPlayer, yPlayer = posPlayer
-    if action[-1].isupper(): # the move was a push
-        x1, y1 = xPlayer + 2 * action[0], yPlayer + 2 * action[1]
+    offset, letter = action
+    if letter.isupper(): # the move was a push
+        target = posPlayer + 2 * offset
     else:
-        x1, y1 = xPlayer + action[0], yPlayer + action[1]
-    return (x1, y1) not in posBox + posWalls
+        target = posPlayer + offset
+    return not ctx.wallCells[target] and not boxMask >> target & 1
 
-def legalActions(posPlayer, posBox):
-    """Return all legal actions for the agent in the current game state"""
-    allActions = [[-1,0,'u','U'],[1,0,'d','D'],[0,-1,'l','L'],[0,1,'r','R']]
-    xPlayer, yPlayer = posPlayer
+def legalActions(ctx, posPlayer, boxMask):
+    """Return all legal actions for the agent in the current game state: the moves engine.try_move
+    allows, on the cell and bitmask encoding of the search"""
     legalActions = []
-    for action in allActions:
-        x1, y1 = xPlayer + action[0], yPlayer + action[1]
-        if (x1, y1) in posBox: # the move was a push
-            action.pop(2) # drop the little letter
+    for offset, move, push in ctx.allActions:
+        if boxMask >> (posPlayer + offset) & 1: # the move was a push
+            action = (offset, push)
         else:
-            action.pop(3) # drop the upper letter
-        if isLegalAction(action, posPlayer, posBox):
+            action = (offset, move)
+        if isLegalAction(ctx, action, posPlayer, boxMask):
             legalActions.append(action)
-        else: 
-            continue     
-    return tuple(tuple(x) for x in legalActions)
-
-def updateState(posPlayer, posBox, action):
-    """Return updated game state after an action is taken"""
-    xPlayer, yPlayer = posPlayer # the previous position of player
-    newPosPlayer = [xPlayer + action[0], yPlayer + action[1]] # the current position of player
-    posBox = [list(x) for x in posBox]
-    if action[-1].isupper(): # if pushing, update the position of box
-        posBox.remove(newPosPlayer)
-        posBox.append([xPlayer + 2 * action[0], yPlayer + 2 * action[1]])
-    posBox = tuple(tuple(x) for x in posBox)
-    newPosPlayer = tuple(newPosPlayer)
-    return newPosPlayer, posBox
-
-def isFailed(posBox):
-    """This function used to observe if the state is potentially failed, then prune the search"""
-    rotatePattern = [[0,1,2,3,4,5,6,7,8],
-                    [2,5,8,1,4,7,0,3,6],
-                    [0,1,2,3,4,5,6,7,8][::-1],
-                    [2,5,8,1,4,7,0,3,6][::-1]]
-    flipPattern = [[2,1,0,5,4,3,8,7,6],
-                    [0,3,6,1,4,7,2,5,8],
-                    [2,1,0,5,4,3,8,7,6][::-1],
-                    [0,3,6,1,4,7,2,5,8][::-1]]
-    allPattern = rotatePattern + flipPattern
+    return tuple(legalActions)
+
+def updateState(posPlayer, boxMask, action):
+    """Return updated game state after an action is taken, as engine.step would leave it"""
+    offset, letter = action
+    newPosPlayer = posPlayer + offset # the current position of player
+    if letter.isupper(): # if pushing, move the box bit one cell further
+        boxMask ^= (1 << newPosPlayer) | (1 << (newPosPlayer + offset))
+    return newPosPlayer, boxMask
+
+"""Push-level rules: the player walks freely inside its region and every edge is a push"""
+
+def reachableRegion(ctx, posPlayer, boxMask):
+    """Flood fill the cells the player can walk to without pushing; return their marks and the smallest one"""
+    blocked = bytearray(ctx.wallCells)
+    for box in cellsOf(boxMask):
+        blocked[box] = 1
+    region = bytearray(len(ctx.wallCells))
+    region[posPlayer] = 1
+    smallest = posPlayer # the canonical player cell of the region
+    stack = [posPlayer]
+    while stack:
+        cell = stack.pop()
+        for offset, _, _ in ctx.allActions:
+            neighbour = cell + offset
+            if not blocked[neighbour] and not region[neighbour]:
+                region[neighbour] = 1
+                stack.append(neighbour)
+                if neighbour < smallest:
+                    smallest = neighbour
+    return region, smallest
+
+def legalPushes(ctx, region, boxMask):
+    """Return the (box, offset, letter) pushes available to a player walking inside region"""
+    pushes = []
+    for box in cellsOf(boxMask):
+        for offset, _, push in ctx.allActions:
+            target = box + offset
+            if region[box - offset] and not ctx.wallCells[target] and not boxMask >> target & 1:
+                pushes.append((box, offset, push))
+    return pushes
+
+CORRAL_NODE_LIMIT = 100 # push states searched before a corral is assumed not to be a deadlock
+
+def findCorrals(ctx, region, boxMask):
+    """Return the corrals of a state: the areas the player can not reach, each a list of cells holding
+    free cells and the boxes fencing them off from the region, two areas sharing a box being one corral"""
+    seen = bytearray(len(ctx.wallCells))
+    corrals = []
+    for box in cellsOf(boxMask):
+        if seen[box] or not any(region[box + offset] for offset, _, _ in ctx.allActions):
+            continue
+        seen[box] = 1
+        cells = []
+        stack = [box]
+        while stack:
+            cell = stack.pop()
+            cells.append(cell)
+            for offset, _, _ in ctx.allActions:
+                neighbour = cell + offset
+                if not seen[neighbour] and not ctx.wallCells[neighbour] and not region[neighbour]:
+                    seen[neighbour] = 1
+                    stack.append(neighbour)
+        corrals.append(cells)
+    return corrals
+
+def isPICorral(ctx, region, boxMask, inside):
+    """Check if a corral, given as its set of cells, is a PI-corral: its boxes can only ever be pushed into it,
+    and the player can already reach every cell from which one of them is pushed into a free cell of it"""
+    for box in inside:
+        if not boxMask >> box & 1:
+            continue
+        for offset, _, _ in ctx.allActions:
+            pusher, target = box - offset, box + offset
+            if ctx.wallCells[pusher] or pusher in inside or ctx.wallCells[target]:
+                continue # only a player inside the corral, which the player is not, could push it this way
+            if target not in inside:
+                return False # the box may be pushed out of or along the corral
+            if not boxMask >> target & 1 and not region[pusher]:
+                return False
+    return True
+
+def isCorralDeadlock(ctx, playerCell, boxMask, inside):
+    """Check if the boxes of a corral, every other box removed, can neither all reach goals nor let the player
+    into a free cell of the corral within CORRAL_NODE_LIMIT push states. Removing boxes only helps the player,
+    so a corral failing alone fails in the full state"""
+    freeCells = [cell for cell in inside if not boxMask >> cell & 1]
+    queue = collections.deque([(playerCell, boxMask)])
+    seen = set()
+    while queue:
+        player, mask = queue.popleft()
+        if not mask & ~ctx.goalMask:
+            return False
+        region, canonical = reachableRegion(ctx, player, mask)
+        if (canonical, mask) in seen:
+            continue
+        seen.add((canonical, mask))
+        if any(region[cell] for cell in freeCells) or len(seen) > CORRAL_NODE_LIMIT:
+            return False
+        for box, offset, _ in legalPushes(ctx, region, mask):
+            newMask = mask ^ (1 << box) ^ (1 << box + offset)
+            if not isFailed(ctx, newMask, box + offset):
+                queue.append((box, newMask))
+    return True
+
+def corralPushes(ctx, playerCell, region, boxMask, pushes, deadlocks):
+    """PI-corral pruning: when unsolved PI-corrals exist, some push into one of them comes first in a solution
+    and can be made now, so only the pushes into the PI-corral with the fewest of them are kept; none are kept
+    when that corral is a deadlock. deadlocks caches the verdicts by corral boxes and player cell"""
+    best = None
+    for cells in findCorrals(ctx, region, boxMask):
+        if all(ctx.goalMask >> cell & 1 == boxMask >> cell & 1 for cell in cells):
+            continue # every box of the corral is on a goal and every goal of it covered: it needs no push
+        inside = set(cells)
+        if isPICorral(ctx, region, boxMask, inside):
+            kept = [push for push in pushes if push[0] in inside]
+            if best is None or len(kept) < len(best[0]):
+                best = (kept, inside)
+    if best is None:
+        return pushes
+    kept, inside = best
+    if kept:
+        corralMask = sum(1 << cell for cell in inside if boxMask >> cell & 1)
+        key = (corralMask, playerCell)
+        if key not in deadlocks:
+            deadlocks[key] = isCorralDeadlock(ctx, playerCell, corralMask, inside)
+        if deadlocks[key]:
+            return []
+    return kept
+
+"""Macro pushes: static analysis of the level finding tunnels and goal rooms, whose pushes the push search
+chains into one successor"""
+
+class GoalRoom:
+    """An area of goals behind a single entrance cell, entered by a box pushed along one direction:
+    the goals in the order they can all be filled from the entrance, and the pushes bringing the entering
+    box to the next goal once the first k are filled"""
+    __slots__ = ('mask', 'order', 'filled', 'paths')
+
+    def __init__(self, cells, order, paths):
+        self.mask = sum(1 << cell for cell in cells) # the cells of the room, entrance excluded
+        self.order = order
+        self.filled = {sum(1 << goal for goal in order[:k]): k for k in range(len(order))} # boxes in the room -> k
+        self.paths = paths # paths[k]: the (box cell, offset) pushes from the entrance to order[k]
+
+def interiorCells(ctx):
+    """Return the set of the cells connected to a goal without crossing a wall: the inside of the level"""
+    inside = set(ctx.goalCells)
+    stack = list(ctx.goalCells)
+    while stack:
+        cell = stack.pop()
+        for offset, _, _ in ctx.allActions:
+            neighbour = cell + offset
+            if not ctx.wallCells[neighbour] and neighbour not in inside:
+                inside.add(neighbour)
+                stack.append(neighbour)
+    return inside
+
+def computeTunnels(ctx):
+    """Return the (cell, offset) pairs where a box pushed along offset lands in a one-wide tunnel and the player
+    following it has walls on both sides as well, so the box can only be pushed on: walls left and right of the
+    cell and of the cell behind it, the cell being no goal"""
+    tunnels = set()
+    for cell in interiorCells(ctx):
+        if ctx.goalMask >> cell & 1:
+            continue
+        for offset, _, _ in ctx.allActions:
+            behind, side = cell - offset, ctx.mapWidth if abs(offset) == 1 else 1
+            if (not ctx.wallCells[behind] and ctx.wallCells[cell - side] and ctx.wallCells[cell + side]
+                    and ctx.wallCells[behind - side] and ctx.wallCells[behind + side]):
+                tunnels.add((cell, offset))
+    return tunnels
+
+def roomRegion(ctx, allowed, blocked, player, box):
+    """Return the set of the allowed cells the player walks to around the blocked cells and the box"""
+    region = {player}
+    stack = [player]
+    while stack:
+        cell = stack.pop()
+        for offset, _, _ in ctx.allActions:
+            neighbour = cell + offset
+            if neighbour in allowed and neighbour not in blocked and neighbour != box and neighbour not in region:
+                region.add(neighbour)
+                stack.append(neighbour)
+    return region
+
+def roomPushPath(ctx, allowed, blocked, box, player, goal):
+    """Return the fewest (box cell, offset) pushes bringing a box to goal while the player walks the allowed
+    cells around the blocked ones, None when there are none"""
+    start = (box, min(roomRegion(ctx, allowed, blocked, player, box)))
+    previous = {start: None}
+    queue = collections.deque([(box, player)])
+    while queue:
+        box, player = queue.popleft()
+        reachable = roomRegion(ctx, allowed, blocked, player, box)
+        state = (box, min(reachable))
+        if box == goal:
+            pushes = []
+            while previous[state] is not None:
+                state, push = previous[state]
+                pushes.append(push)
+            return pushes[::-1]
+        for offset, _, _ in ctx.allActions:
+            target = box + offset
+            if box - offset in reachable and target in allowed and target not in blocked and not ctx.deadCells[target]:
+                child = (target, min(roomRegion(ctx, allowed, blocked, box, target)))
+                if child not in previous:
+                    previous[child] = (state, (box, offset))
+                    queue.append((target, box))
+    return None
+
+def separatedGoalAreas(ctx):
+    """Return the (cells, entrance) pairs of the areas made only of goals that a single cell, no goal itself,
+    cuts off from the rest of the level. A depth-first search of each part of the level, rooted at a cell that
+    is no goal, finds the articulation points (Tarjan): a child whose subtree has no edge back above its parent
+    is cut off by the parent, and its subtree, contiguous in discovery order, is the area"""
+    inside = interiorCells(ctx)
+    discovery = {} # discovery index of every visited cell
+    low = {} # lowest discovery index reached from the subtree of a cell by one back edge
+    size = {} # cells in the subtree of a cell
+    goals = {} # goals in the subtree of a cell
+    order = [] # the cells in discovery order
+    areas = []
+    for root in sorted(inside):
+        if root in discovery or ctx.goalMask >> root & 1:
+            continue
+        discovery[root] = low[root] = len(order)
+        size[root], goals[root] = 1, 0
+        order.append(root)
+        rootChildren = 0 # the root cuts off its subtrees only when it has several
+        rootAreas = []
+        stack = [(root, None, iter(ctx.allActions))]
+        while stack:
+            cell, parent, actions = stack[-1]
+            for offset, _, _ in actions:
+                neighbour = cell + offset
+                if neighbour not in inside:
+                    continue
+                if neighbour not in discovery:
+                    discovery[neighbour] = low[neighbour] = len(order)
+                    size[neighbour] = 1
+                    goals[neighbour] = ctx.goalMask >> neighbour & 1
+                    order.append(neighbour)
+                    rootChildren += cell == root
+                    stack.append((neighbour, cell, iter(ctx.allActions)))
+                    break
+                if neighbour != parent:
+                    low[cell] = min(low[cell], discovery[neighbour])
+            else:
+                stack.pop()
+                if parent is None:
+                    continue
+                size[parent] += size[cell]
+                goals[parent] += goals[cell]
+                low[parent] = min(low[parent], low[cell])
+                if low[cell] >= discovery[parent] and goals[cell] == size[cell] and not ctx.goalMask >> parent & 1:
+                    (rootAreas if parent == root else areas).append((order[discovery[cell]:discovery[cell] + size[cell]], parent))
+        if rootChildren > 1:
+            areas += rootAreas
+    return areas
+
+def computeGoalRooms(ctx):
+    """Return the goal rooms of the level, keyed by (entrance cell, offset of the entering push). A room is an
+    area made only of goals that a single cell, no goal itself, separates from the rest of the level: a box
+    entering it has nothing to do but fill a goal, whereas an area with free cells may be needed to move boxes
+    around. Its fill order puts first, among the goals still reachable, the farthest one whose filling leaves
+    every other goal reachable, and rooms without a complete order are left out"""
+    goalRooms = {}
+    for area, entrance in separatedGoalAreas(ctx):
+        cells = goals = frozenset(area)
+        for offset, _, _ in ctx.allActions:
+            pusher = entrance - offset # where the player stands once the box is on the entrance
+            if entrance + offset not in cells or ctx.wallCells[pusher] or pusher in cells:
+                continue
+            allowed = cells | {entrance, pusher}
+            order, paths, filled = [], [], set()
+            while len(order) < len(goals):
+                candidates = []
+                for goal in goals - filled:
+                    path = roomPushPath(ctx, allowed, filled, entrance, pusher, goal)
+                    if path is not None:
+                        candidates.append((len(path), goal, path))
+                for _, goal, path in sorted(candidates, reverse=True):
+                    rest = goals - filled - {goal}
+                    if all(roomPushPath(ctx, allowed, filled | {goal}, entrance, pusher, other) is not None for other in rest):
+                        break
+                else:
+                    break # no goal can be filled without cutting off another one
+                order.append(goal)
+                paths.append(path)
+                filled.add(goal)
+            if len(order) == len(goals):
+                goalRooms[(entrance, offset)] = GoalRoom(cells, order, paths)
+    return goalRooms
+
+def macroPushes(ctx, box, offset, boxMask, goalRooms=True):
+    """Return the (box cell, offset) pushes made when box is pushed along offset, and the boxes after them: the
+    push alone, followed by a tunnel macro pushing the box on while it stays in a tunnel, then, with goalRooms,
+    by a goal-room macro taking a box pushed onto the entrance of a room to the next goal of its fill order"""
+    pushes = [(box, offset)]
+    boxMask ^= (1 << box) | (1 << box + offset)
+    box += offset
+    while (box + offset, offset) in ctx.tunnels and not boxMask >> box + offset & 1 and not ctx.deadCells[box + offset]:
+        pushes.append((box, offset))
+        boxMask ^= (1 << box) | (1 << box + offset)
+        box += offset
+    room = ctx.goalRooms.get((box, offset)) if goalRooms else None
+    if room is not None:
+        k = room.filled.get(boxMask & room.mask)
+        if k is not None:
+            pushes += room.paths[k]
+            boxMask ^= (1 << box) | (1 << room.order[k])
+    return pushes, boxMask
+
+def walkPath(ctx, start, goal, boxMask):
+    """Return the shortest walk (lowercase actions) between two cells without pushing any box"""
+    previous = {start: None}
+    queue = collections.deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            break
+        for offset, move, _ in ctx.allActions:
+            neighbour = cell + offset
+            if neighbour not in previous and not ctx.wallCells[neighbour] and not boxMask >> neighbour & 1:
+                previous[neighbour] = (cell, move)
+                queue.append(neighbour)
+    moves = []
+    while previous[goal] is not None:
+        goal, move = previous[goal]
+        moves.append(move)
+    return moves[::-1]
+
+def isFailed(ctx, boxMask, box):
+    """This function used to observe if pushing a box onto the given cell fails the state, then prune the search"""
+    if ctx.deadCells[box]: # the box can never reach a goal from here
+        return True
+    return isFreezeDeadlock(ctx, boxMask, box)
+
+def isFreezeDeadlock(ctx, boxMask, box):
+    """Check if the pushed box belongs to a group of boxes that can never move again, one of them off its goal"""
+    group = {box} # the boxes touching the pushed box, directly or through other boxes
+    queue = [box]
+    while queue:
+        cell = queue.pop()
+        for offset, _, _ in ctx.allActions:
+            neighbour = cell + offset
+            if boxMask >> neighbour & 1 and neighbour not in group:
+                group.add(neighbour)
+                queue.append(neighbour)
+    frozen = set(group) # assume every box is frozen, then release those that can still move
+    changed = True
+    while changed:
+        changed = False
+        for cell in list(frozen):
+            if not (isBlocked(ctx, cell, 1, frozen) and isBlocked(ctx, cell, ctx.mapWidth, frozen)):
+                frozen.discard(cell)
+                changed = True
+    return any(not ctx.goalMask >> cell & 1 for cell in frozen)
+
+def isBlocked(ctx, cell, offset, frozen):
+    """Check if a box can not be pushed along the axis of offset: walls, dead squares on both sides or frozen boxes"""
+    before, after = cell - offset, cell + offset
+    return (ctx.wallCells[before] or ctx.wallCells[after] or (ctx.deadCells[before] and ctx.deadCells[after])
+            or before in frozen or after in frozen)
 
-    for box in posBox:
-        if box not in posGoals:
-            board = [(box[0] - 1, box[1] - 1), (box[0] - 1, box[1]), (box[0] - 1, box[1] + 1), 
-                    (box[0], box[1] - 1), (box[0], box[1]), (box[0], box[1] + 1), 
-                    (box[0] + 1, box[1] - 1), (box[0] + 1, box[1]), (box[0] + 1, box[1] + 1)]
-            for pattern in allPattern:
-                newBoard = [board[i] for i in pattern]
-                if newBoard[1] in posWalls and newBoard[5] in posWalls: return True
-                elif newBoard[1] in posBox and newBoard[2] in posWalls and newBoard[5] in posWalls: return True
-                elif newBoard[1] in posBox and newBoard[2] in posWalls and newBoard[5] in posBox: return True
-                elif newBoard[1] in posBox and newBoard[2] in posBox and newBoard[5] in posBox: return True
-                elif newBoard[1] in posBox and newBoard[6] in posBox and newBoard[2] in posWalls and newBoard[3] in posWalls and newBoard[8] in posWalls: return True
-    return False
-    
 def cost(actions):
     """A cost function"""
     return len([x for x in actions if x.islower()])
 
-def uniformCostSearch(gameState):
+def moveCost(actions):
+    """A cost function counting every move, pushes included"""
+    return len(actions)
+
+"""Heuristics estimating the remaining cost of a state from its boxes"""
+
+INFINITY = float('inf')
+UNREACHABLE = 10 ** 6 # finite stand-in for an infinite distance inside the matching
+MATCHING_BOX_LIMIT = 10 # above this many boxes the matching is replaced by the Manhattan bound
+WASTAR_WEIGHT = 2 # weight of the heuristic in weighted A*
+METHODS = ('ucs', 'astar', 'wastar', 'idastar', 'anytime')
+ANYTIME_WEIGHTS = (5, 3, 2, 1.5, 1) # heuristic weights of the successive runs of the anytime method
+
+def computePushDistances(ctx):
+    """Return, for each goal, the minimum number of pushes bringing a box from every cell to it (ignoring other boxes)"""
+    distances = []
+    for goal in ctx.goalCells:
+        distance = [UNREACHABLE] * len(ctx.wallCells)
+        distance[goal] = 0
+        queue = collections.deque([goal])
+        while queue:
+            box = queue.popleft()
+            for offset, _, _ in ctx.allActions:
+                previous = box + offset # the box came from here, pushed by a player standing one cell further
+                if not ctx.wallCells[previous] and not ctx.wallCells[previous + offset] and distance[previous] == UNREACHABLE:
+                    distance[previous] = distance[box] + 1
+                    queue.append(previous)
+        distances.append(distance)
+    return distances
+
+def computeDeadCells(ctx):
+    """Mark the simple dead squares: cells from which a box can not be pushed to any goal"""
+    dead = bytearray(len(ctx.wallCells))
+    for cell in range(len(ctx.wallCells)):
+        dead[cell] = all(distance[cell] == UNREACHABLE for distance in ctx.pushDistances)
+    return dead
+
+def minimumMatching(costMatrix):
+    """Return the minimum total cost of assigning every row to a distinct column (Hungarian algorithm, rows <= columns)"""
+    if not costMatrix or not costMatrix[0]: # no box or no goal: nothing to assign
+        return 0
+    rows, columns = len(costMatrix), len(costMatrix[0])
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    match = [0] * (columns + 1) # row matched to each column, 0 for none
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        column = 0
+        minimum = [INFINITY] * (columns + 1)
+        used = [False] * (columns + 1)
+        while match[column]:
+            used[column] = True
+            current, delta, nextColumn = match[column], INFINITY, 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = costMatrix[current - 1][j - 1] - u[current] - v[j]
+                    if reduced < minimum[j]:
+                        minimum[j], way[j] = reduced, column
+                    if minimum[j] < delta:
+                        delta, nextColumn = minimum[j], j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minimum[j] -= delta
+            column = nextColumn
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+    return -v[0]
+
+def matchingHeuristic(ctx, boxMask):
+    """Lower bound on the remaining pushes: minimum-cost matching of boxes to goals over push distances"""
+    boxes = cellsOf(boxMask)
+    costMatrix = [[distance[box] for distance in ctx.pushDistances] for box in boxes]
+    if len(boxes) > len(ctx.goalCells):
+        costMatrix = [list(column) for column in zip(*costMatrix)]
+    total = minimumMatching(costMatrix)
+    return INFINITY if total >= UNREACHABLE else total
+
+def manhattanHeuristic(ctx, boxMask):
+    """Cheaper lower bound: each box counted at the Manhattan distance of its nearest goal"""
+    goals = [posOf(ctx, goal) for goal in ctx.goalCells]
+    total = 0
+    for x, y in decodeBoxes(ctx, boxMask):
+        total += min(abs(x - xGoal) + abs(y - yGoal) for xGoal, yGoal in goals)
+    return total
+
+def heuristic(ctx, boxMask):
+    """Estimate the remaining moves of a state, INFINITY if a box can no longer reach any goal"""
+    if bin(boxMask).count('1') <= MATCHING_BOX_LIMIT:
+        return matchingHeuristic(ctx, boxMask)
+    return manhattanHeuristic(ctx, boxMask)
+
+def bestFirstSearch(ctx, beginPlayer, beginBox, costFunction, weight=0, table=None, stats=None, bound=INFINITY):
+    """Expand the node minimizing cost + weight * heuristic first (uniform cost search when weight is 0),
+    starting with the player on cell beginPlayer and the boxes of bitmask beginBox.
+    table is the TranspositionTable recording explored states, a default sized one when None;
+    stats, if given, is a SearchStats receiving the counters and phase times;
+    children whose cost plus heuristic reaches bound are dropped, so only cheaper solutions are found"""
+    playerKeys, boxKeys = ctx.playerKeys, ctx.boxKeys
+
+    tree = SearchTree() # store every generated node once, linked to its parent
+    frontier = PriorityQueue() # store node indices with (priority, heuristic), ties go to the node closer to the goal
+    frontier.push(tree.add(-1, ' ', beginPlayer, beginBox, 0, zobristHash(ctx, beginPlayer, beginBox)), (0, 0)) #starting node with cost 0 will be given priority
+    exploredSet = table if table is not None else TranspositionTable() # hashes of explored states -> improve performance and bound memory usage
+    heuristicCache = {} # the heuristic only depends on the boxes, which most moves leave in place
+    stats = stats if stats is not None else SearchStats()
+    times, timing, clock = stats.phaseTimes, stats.timePhases, time.perf_counter
+    while not frontier.isEmpty(): # loop until we find solutions or frontier is empty
+        node = frontier.pop() #select the node at the top of the queue (node with lowest cost)
+        state = (tree.player[node], tree.boxes[node])
+        if isEndState(ctx, state[1]): #check if node state is game end state
+            return tree.path(node) #rebuild the actions that lead to the end
+        stateHash = tree.hash[node]
+        if stateHash in exploredSet: #check if the current node is opened yet
+            stats.duplicates += 1
+            continue
+        exploredSet.add(stateHash) #add node to explored set
+        stats.expand(len(frontier.Heap), len(exploredSet))
+        Cost = tree.cost[node] #get the cost
+        if timing: start = clock()
+        actions = legalActions(ctx, *state)
+        if timing: times['legal'] += clock() - start
+        for action in actions: #cycle through all possible valid actions from the current state
+            isPush = action[-1].isupper()
+            if timing: start = clock()
+            newState = updateState(state[0], state[1], action) #with each posible actions return 1 value pair newposplayer and newposbox
+            if timing: now = clock(); times['update'] += now - start; start = now
+            newHash = stateHash ^ playerKeys[state[0]] ^ playerKeys[newState[0]] #update the hash in O(1)
+            if isPush:
+                newHash ^= boxKeys[newState[0]] ^ boxKeys[newState[0] + action[0]]
+            seen = newHash in exploredSet
+            if timing: now = clock(); times['hashing'] += now - start; start = now
+            if seen: #skip nodes already opened
+                stats.duplicates += 1
+                continue
+            if isPush: #only a push can make the state fail
+                failed = isFailed(ctx, newState[1], newState[0] + action[0])
+                if timing: now = clock(); times['deadlock'] += now - start; start = now
+                if failed:
+                    stats.pruned += 1
+                    continue
+            newCost = Cost + costFunction(action[-1]) #the cost of a single step
+            h = 0
+            if weight:
+                h = heuristicCache.get(newState[1])
+                if h is None:
+                    h = heuristicCache[newState[1]] = heuristic(ctx, newState[1])
+                if timing: times['heuristic'] += clock() - start
+                if h == INFINITY: # a box can no longer reach any goal
+                    stats.deadEnds += 1
+                    continue
+            if newCost + h >= bound:
+                stats.bounded += 1
+                continue
+            frontier.push(tree.add(node, action[-1], newState[0], newState[1], newCost, newHash), (newCost + weight * h, h))
+            stats.generated += 1
+    return []
+
+def uniformCostSearch(ctx, beginPlayer, beginBox, table=None, stats=None):
     """Implement uniformCostSearch approach"""
-    beginBox = PosOfBoxes(gameState)
-    beginPlayer = PosOfPlayer(gameState)
-
-    startState = (beginPlayer, beginBox, None) # add a None value to represent the last action
-    frontier = PriorityQueue() # store states with cost
-    frontier.push([startState], 0) #starting node with cost 0 will be given priority
-    exploredSet = set() # store exploration nodes -> improve performance and reduce memory usage
-    actions = PriorityQueue() # store actions with cost
-    actions.push([0], 0) #starting node with cost 0 will be given priority
-    temp = []
-    ### Implement uniform cost search here
-    while frontier: # loop until we find solutions or frontier is empty
-        node = frontier.pop() #select the nodes at the top of the queue one by one (node with lowest cost)
-        node_action = actions.pop() #select the action at the top of the queue one by one (node with lowest cost)
-        if isEndState(node[-1][-2]): #check if node state is game end state
-            temp += node_action[1:] #insert all the actions lead to the end
-            break #exit frontier
-        if node[-1] not in exploredSet: #check if the current node is opened yet
-            exploredSet.add(node[-1]) #add node to explored set 
-            Cost = cost(node_action[1:]) #get the cost
-            for action in legalActions(node[-1][0], node[-1][1]): #cycle through all possible valid actions from the current state
-                newPosPlayer, newPosBox = updateState(node[-1][0], node[-1][1], action) #with each posible actions return 1 value pair newposplayer and newposbox
-                if isFailed(newPosBox): #check if the opened node that fail or not
-                    continue #if yes, skip
-                frontier.push(node + [(newPosPlayer, newPosBox, action)], Cost) #if not fail push the new node to the frontier with the priority of cost
-                actions.push(node_action + [action[-1]], Cost) #if not fail push the new node to the frontier with the priority of cost
-    return temp
+    return bestFirstSearch(ctx, beginPlayer, beginBox, cost, table=table, stats=stats)
 
-def get_move(layout, player_pos, method):
-    global posWalls, posGoals
-    gameState = transferToGameState2(layout, player_pos)
-    posWalls = PosOfWalls(gameState)
-    posGoals = PosOfGoals(gameState)  
-    if method == 'ucs':
-        result = uniformCostSearch(gameState)
-    else:
+def aStarSearch(ctx, beginPlayer, beginBox, weight=1, table=None, stats=None, bound=INFINITY):
+    """Implement A* (weighted A* when weight > 1) minimizing the number of moves"""
+    return bestFirstSearch(ctx, beginPlayer, beginBox, moveCost, weight, table, stats, bound)
+
+def pushSearch(ctx, beginPlayer, beginBox, weight=0, table=None, stats=None, bound=INFINITY):
+    """Search over pushes only (uniform cost when weight is 0), then fill in the walks between pushes.
+    Pushes whose count plus heuristic reaches bound are dropped, as in bestFirstSearch"""
+    playerKeys, boxKeys = ctx.playerKeys, ctx.boxKeys
+
+    tree = SearchTree() # player holds the cell the player stands on right after the push, hash covers the boxes only
+    frontier = PriorityQueue()
+    frontier.push(tree.add(-1, ' ', beginPlayer, beginBox, 0, zobristHash(ctx, None, beginBox)), (0, 0))
+    exploredSet = table if table is not None else TranspositionTable() # states hashed with the smallest reachable cell: every player cell of a region is one state
+    heuristicCache = {}
+    corralDeadlocks = {} # (corral boxes, player cell) -> True when the corral can never be solved
+    pushLetters = {offset: push for offset, _, push in ctx.allActions}
+    stats = stats if stats is not None else SearchStats()
+    times, timing, clock = stats.phaseTimes, stats.timePhases, time.perf_counter
+    while not frontier.isEmpty():
+        node = frontier.pop()
+        boxMask = tree.boxes[node]
+        if isEndState(ctx, boxMask):
+            return pushPathToMoves(ctx, tree, node)
+        if timing: start = clock()
+        region, canonical = reachableRegion(ctx, tree.player[node], boxMask)
+        if timing: now = clock(); times['legal'] += now - start; start = now
+        boxHash = tree.hash[node]
+        stateHash = boxHash ^ playerKeys[canonical]
+        seen = stateHash in exploredSet
+        if timing: times['hashing'] += clock() - start
+        if seen:
+            stats.duplicates += 1
+            continue
+        exploredSet.add(stateHash)
+        stats.expand(len(frontier.Heap), len(exploredSet))
+        Cost = tree.cost[node] # every push costs 1
+        if timing: start = clock()
+        pushes = legalPushes(ctx, region, boxMask)
+        if timing: now = clock(); times['legal'] += now - start; start = now
+        kept = corralPushes(ctx, canonical, region, boxMask, pushes, corralDeadlocks)
+        if timing: times['corral'] += clock() - start
+        stats.corralPruned += len(pushes) - len(kept)
+        for box, offset, _ in kept:
+            if timing: start = clock()
+            macro, newBoxMask = macroPushes(ctx, box, offset, boxMask, weight > 1)
+            target = macro[-1][0] + macro[-1][1]
+            if timing: now = clock(); times['update'] += now - start; start = now
+            failed = isFailed(ctx, newBoxMask, target)
+            if timing: now = clock(); times['deadlock'] += now - start; start = now
+            if failed:
+                stats.pruned += 1
+                continue
+            h = 0
+            if weight:
+                h = heuristicCache.get(newBoxMask)
+                if h is None:
+                    h = heuristicCache[newBoxMask] = heuristic(ctx, newBoxMask)
+                if timing: now = clock(); times['heuristic'] += now - start; start = now
+                if h == INFINITY:
+                    stats.deadEnds += 1
+                    continue
+            if Cost + len(macro) + h >= bound:
+                stats.bounded += 1
+                continue
+            child, newCost, mask, newHash = node, Cost, boxMask, boxHash
+            for pushed, pushOffset in macro: # the pushes of a macro are chained in the tree, only the last one is queued
+                mask ^= (1 << pushed) | (1 << pushed + pushOffset)
+                newHash ^= boxKeys[pushed] ^ boxKeys[pushed + pushOffset]
+                newCost += 1
+                child = tree.add(child, pushLetters[pushOffset], pushed, mask, newCost, newHash)
+            if timing: times['hashing'] += clock() - start
+            frontier.push(child, (newCost + weight * h, h))
+            stats.generated += 1
+    return []
+
+def pushPathToMoves(ctx, tree, node):
+    """Expand the pushes leading to a node into the full list of moves"""
+    nodes = tree.lineage(node)
+    offsets = {push: offset for offset, _, push in ctx.allActions}
+    moves = []
+    posPlayer = tree.player[nodes[0]]
+    for parent, child in zip(nodes, nodes[1:]):
+        push = chr(tree.move[child])
+        moves += walkPath(ctx, posPlayer, tree.player[child] - offsets[push], tree.boxes[parent])
+        moves.append(push)
+        posPlayer = tree.player[child]
+    return moves
+
+IDA_CACHE_BYTES = 16 * 1024 * 1024 # default memory shared by the caches of IDA*
+DICT_ENTRY_BYTES = 52 # measured memory of a dict entry besides its key object, table growth included
+
+def idaCacheCapacities(ctx, maxBytes):
+    """Split maxBytes between the caches of IDA*: half to the lowest g of the states, a quarter each to the
+    heuristic and to the corral deadlocks, and return their capacities in entries, each entry costed with its
+    key object: a 64-bit hash, a box bitmask of the level, a (bitmask, cell) tuple"""
+    maskBytes = sys.getsizeof(1 << len(ctx.wallCells))
+    tupleBytes = sys.getsizeof((0, 0)) + maskBytes + sys.getsizeof(len(ctx.wallCells))
+    return (max(1, maxBytes // 2 // (DICT_ENTRY_BYTES + sys.getsizeof(1 << 63))),
+            max(1, maxBytes // 4 // (DICT_ENTRY_BYTES + maskBytes)),
+            max(1, maxBytes // 4 // (DICT_ENTRY_BYTES + tupleBytes)))
+
+def idaStarSearch(ctx, beginPlayer, beginBox, pushes=False, table=None, stats=None):
+    """Iterative deepening A*: depth-first searches cut at f = g + heuristic > bound, the bound then raised
+    to the smallest f that was cut, over moves or, with pushes, over pushes. Memory is the current path plus
+    a cache of the lowest g reached by each state in the current iteration and caches of the heuristic and of
+    the corral deadlocks, sharing the bytes of table (a TranspositionTable), IDA_CACHE_BYTES when None"""
+    maxBytes = table.capacity * TABLE_ENTRY_BYTES if table is not None else IDA_CACHE_BYTES
+    costCapacity, heuristicCapacity, corralCapacity = idaCacheCapacities(ctx, maxBytes)
+    stats = stats if stats is not None else SearchStats()
+    playerKeys, boxKeys = ctx.playerKeys, ctx.boxKeys
+    heuristicCache = {}
+    corralDeadlocks = {} # as in pushSearch
+    bound = heuristic(ctx, beginBox)
+    while bound < INFINITY:
+        bestCost = {} # state hash -> lowest g reaching it in this iteration
+        nextBound = INFINITY
+        path = [(' ', beginPlayer, beginBox, zobristHash(ctx, None if pushes else beginPlayer, beginBox))]
+        children = [None] # children left to try at each depth of path, None until the node is expanded
+        while path:
+            if children[-1] is None:
+                _, player, boxMask, hash = path[-1]
+                g = len(path) - 1 # every move, or every push, costs 1
+                if isEndState(ctx, boxMask):
+                    return idaPathToMoves(ctx, path, pushes)
+                if pushes: # as in pushSearch, every player cell of a region is the same state
+                    region, canonical = reachableRegion(ctx, player, boxMask)
+                    key = hash ^ playerKeys[canonical]
+                else:
+                    key = hash
+                if bestCost.get(key, INFINITY) <= g:
+                    stats.duplicates += 1
+                    path.pop()
+                    children.pop()
+                    continue
+                if len(bestCost) < costCapacity:
+                    bestCost[key] = g
+                stats.expand(len(path), len(bestCost))
+                if pushes:
+                    if len(corralDeadlocks) >= corralCapacity:
+                        corralDeadlocks.clear()
+                    legal = legalPushes(ctx, region, boxMask)
+                    kept = corralPushes(ctx, canonical, region, boxMask, legal, corralDeadlocks)
+                    stats.corralPruned += len(legal) - len(kept)
+                    successors = [(push, box, boxMask ^ (1 << box) ^ (1 << box + offset), hash ^ boxKeys[box] ^ boxKeys[box + offset], box + offset)
+                                  for box, offset, push in kept]
+                else:
+                    successors = []
+                    for action in legalActions(ctx, player, boxMask):
+                        newPlayer, newBoxMask = updateState(player, boxMask, action)
+                        newHash = hash ^ playerKeys[player] ^ playerKeys[newPlayer]
+                        if action[-1].isupper():
+                            newHash ^= boxKeys[newPlayer] ^ boxKeys[newPlayer + action[0]]
+                        successors.append((action[-1], newPlayer, newBoxMask, newHash, newPlayer + action[0] if action[-1].isupper() else None))
+                expansion = []
+                for letter, newPlayer, newBoxMask, newHash, pushedBox in successors:
+                    if pushedBox is not None and isFailed(ctx, newBoxMask, pushedBox):
+                        stats.pruned += 1
+                        continue
+                    h = heuristicCache.get(newBoxMask)
+                    if h is None:
+                        if len(heuristicCache) >= heuristicCapacity:
+                            heuristicCache.clear()
+                        h = heuristicCache[newBoxMask] = heuristic(ctx, newBoxMask)
+                    if h == INFINITY:
+                        stats.deadEnds += 1
+                        continue
+                    f = g + 1 + h
+                    if f > bound:
+                        nextBound = min(nextBound, f)
+                        continue
+                    expansion.append((f, h, letter, newPlayer, newBoxMask, newHash))
+                    stats.generated += 1
+                expansion.sort(reverse=True) # popped from the end: the most promising child first
+                children[-1] = expansion
+            if children[-1]:
+                _, _, letter, newPlayer, newBoxMask, newHash = children[-1].pop()
+                path.append((letter, newPlayer, newBoxMask, newHash))
+                children.append(None)
+            else:
+                path.pop()
+                children.pop()
+        bound = nextBound
+    return []
+
+def idaPathToMoves(ctx, path, pushes):
+    """Return the moves of an IDA* path, filling in the walks between pushes when the path holds pushes"""
+    if not pushes:
+        return [letter for letter, _, _, _ in path[1:]]
+    tree = SearchTree()
+    node = -1
+    for letter, player, boxMask, hash in path:
+        node = tree.add(node, letter, player, boxMask, 0, hash)
+    return pushPathToMoves(ctx, tree, node)
+
+def searchLevel(ctx, playerCell, boxMask, method, mode='moves', table=None, stats=None, budget=None, onSolution=None):
+    """Solve the level of ctx from the player cell and box bitmask with the given method and mode,
+    returning the list of moves. When the SearchBudget budget runs out the search stops, recording the
+    limit in stats.stopped, and returns the best solution found so far: none, except for 'anytime'.
+    onSolution, if given, is called with every improved solution of 'anytime'"""
+    if method not in METHODS:
         raise ValueError('Invalid method.')
-    return result
\ No newline at end of file
+    if mode not in ('moves', 'pushes'):
+        raise ValueError('Invalid mode.')
+    if stats is None:
+        stats = SearchStats()
+    stats.budget = budget
+    if method == 'anytime':
+        return anytimeSearch(ctx, playerCell, boxMask, mode, table, stats, onSolution)
+    try:
+        if method == 'idastar':
+            result = idaStarSearch(ctx, playerCell, boxMask, mode == 'pushes', table, stats)
+        elif mode == 'pushes':
+            result = pushSearch(ctx, playerCell, boxMask, {'ucs': 0, 'astar': 1, 'wastar': WASTAR_WEIGHT}[method], table, stats)
+        elif method == 'ucs':
+            result = uniformCostSearch(ctx, playerCell, boxMask, table, stats)
+        elif method == 'astar':
+            result = aStarSearch(ctx, playerCell, boxMask, table=table, stats=stats)
+        else:
+            result = aStarSearch(ctx, playerCell, boxMask, WASTAR_WEIGHT, table, stats)
+    except BudgetExceeded as exceeded:
+        stats.stopped = exceeded.args[0]
+        result = []
+    return result
+
+def solutionCost(moves, mode):
+    """Return the cost of a solution to minimize in a mode: its length, or its pushes then its length"""
+    return (sum(1 for x in moves if x.isupper()), len(moves)) if mode == 'pushes' else (len(moves),)
+
+def anytimeBound(best, mode):
+    """Return the bound of the searches following the solution best: its moves, or its pushes plus one
+    so that a solution with as many pushes and fewer moves is still found"""
+    if not best:
+        return INFINITY
+    return solutionCost(best, mode)[0] + (mode == 'pushes')
+
+def anytimeSearch(ctx, playerCell, boxMask, mode, table, stats, onSolution=None):
+    """Run weighted A* with the decreasing weights of ANYTIME_WEIGHTS, each run with a fresh table of the
+    size of table, keeping the best solution: the first, greedy run answers fast and the last one, plain A*,
+    is optimal. Every run after a solution is bounded by its cost, so it only spends time on cheaper ones.
+    A bounded run finding none has explored about what plain A* would: the search goes straight to plain
+    A* then, which proves the best solution optimal. Stop at the end of the weights or when the budget in
+    stats runs out"""
+    best = []
+    weights = list(ANYTIME_WEIGHTS)
+    while weights:
+        weight = weights.pop(0)
+        runTable = TranspositionTable(table.capacity * TABLE_ENTRY_BYTES, table.policy) if table is not None else None
+        bound = anytimeBound(best, mode)
+        try:
+            if mode == 'pushes':
+                result = pushSearch(ctx, playerCell, boxMask, weight, runTable, stats, bound)
+            else:
+                result = aStarSearch(ctx, playerCell, boxMask, weight, runTable, stats, bound)
+        except BudgetExceeded as exceeded:
+            stats.stopped = exceeded.args[0]
+            break
+        if not result:
+            if not best: # no solution at any weight
+                break
+            weights = weights[-1:] # none cheaper within the bound: only plain A* is left to run
+            continue
+        if not best or solutionCost(result, mode) < solutionCost(best, mode):
+            best = result
+            if onSolution:
+                onSolution(best)
+    return best
+
+def solve(gameState, method, mode='moves', table=None, stats=None, budget=None, onSolution=None):
+    """Solve a game state with the given method and mode, returning the list of moves.
+    table is the TranspositionTable of the search, which bounds the memory of explored states;
+    stats, if given, is a SearchStats receiving the counters, phase times and progress callbacks;
+    budget, if given, is a SearchBudget limiting the search, and onSolution a callback of the improved
+    solutions of 'anytime', see searchLevel"""
+    ctx = getLevelContext(gameState)
+    return searchLevel(ctx, cellOf(ctx, PosOfPlayer(gameState)), encodeBoxes(ctx, PosOfBoxes(gameState)),
+                       method, mode, table, stats, budget, onSolution)
+
+def solveCells(cells, method, mode='moves', table=None, stats=None, budget=None, onSolution=None):
+    """Solve a level given in the compact form kept by Level.solver_cells:
+    (mapWidth, walls, goals, playerCell, boxMask), with no grid conversion"""
+    mapWidth, walls, goals, playerCell, boxMask = cells
+    return searchLevel(cachedLevelContext(mapWidth, walls, goals), playerCell, boxMask, method, mode, table, stats, budget,
+                       onSolution)
+
+def get_move(layout, player_pos, method, mode='moves', stats=None, budget=None):
+    return solve(transferToGameState2(layout, player_pos), method, mode, stats=stats, budget=budget)
+
+def backgroundWorker(cells, method, mode, connection, seconds=None, context=None):
+    """Solve a level, given as by Level.solver_cells, in a worker process within seconds, if given,
+    sending ('progress', expanded) messages, ('solution', moves) for every improved solution of
+    'anytime' and finally ('done', moves). context is the LevelContext of the level if the caller
+    has it: a new process starts with an empty cachedLevelContext, and unpickling a context is
+    about ten times faster than building it"""
+    mapWidth, walls, goals, playerCell, boxMask = cells
+    ctx = context if context is not None else cachedLevelContext(mapWidth, walls, goals)
+    stats = SearchStats(callback=lambda stats: connection.send(('progress', stats.expanded)))
+    strategy = searchLevel(ctx, playerCell, boxMask, method, mode, stats=stats,
+                           budget=SearchBudget(seconds) if seconds else None,
+                           onSolution=lambda moves: connection.send(('solution', moves)))
+    connection.send(('done', strategy))
+    connection.close()
+
+"""Headless batch solving: python -m solver batch <levels dir> --out <answers dir> --workers N"""
+
+def loadLevelFile(path):
+    """Read a level file into a game state"""
+    structure, playerPos = engine.load_level(path)
+    return transferToGameState2([row for row in structure if row], playerPos)
+
+def answerFileName(levelPath):
+    """Return the answer file name of a level, level_N.txt for testN.txt as written by the game"""
+    stem = os.path.splitext(os.path.basename(levelPath))[0]
+    match = re.fullmatch(r'test(\d+)', stem)
+    return 'level_%s.txt' % match.group(1) if match else stem + '.txt'
+
+def naturalKey(path):
+    """Sort key putting test2.txt before test10.txt"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+BATCH_BUDGET_SHARE = 0.9 # share of the batch time limit given to the search, so that it reports before being killed
+
+def batchWorker(levelPath, method, mode, memoryLimit, tableBytes, connection, seconds=None):
+    """Solve one level in a worker process within seconds, if given, and send back (status, moves, seconds)"""
+    if memoryLimit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+    start = time.time()
+    stats = SearchStats()
+    try:
+        strategy = solve(loadLevelFile(levelPath), method, mode, table=TranspositionTable(tableBytes), stats=stats,
+                         budget=SearchBudget(seconds) if seconds else None)
+        status = 'solved' if strategy else 'time limit' if stats.stopped else 'no solution'
+    except MemoryError:
+        strategy, status = [], 'memory limit'
+    connection.send((status, strategy, time.time() - start))
+    connection.close()
+
+def batchSolve(levelDir, outDir, workers, method='astar', mode='moves', timeLimit=60, memoryLimit=None,
+               tableBytes=256 * 1024 * 1024):
+    """Solve every level file of a directory in parallel worker processes and write their answer files.
+    A level is abandoned when its worker exceeds timeLimit seconds or memoryLimit bytes; the explored
+    states of each search are kept within tableBytes. Return the summary rows"""
+    levels = sorted((os.path.join(levelDir, name) for name in os.listdir(levelDir) if name.endswith('.txt')), key=naturalKey)
+    os.makedirs(outDir, exist_ok=True)
+    pending = collections.deque(levels)
+    running = {} # receiving end of the worker pipe -> (level path, process, start time)
+    summary = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            levelPath = pending.popleft()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=batchWorker, daemon=True,
+                                              args=(levelPath, method, mode, memoryLimit, tableBytes, sender,
+                                                    timeLimit * BATCH_BUDGET_SHARE if timeLimit else None))
+            process.start()
+            sender.close() # only the worker writes; closing our copy lets a crash show up as end of file
+            running[receiver] = (levelPath, process, time.time())
+        for receiver in multiprocessing.connection.wait(list(running), timeout=0.05):
+            levelPath, process, started = running.pop(receiver)
+            try:
+                status, strategy, elapsed = receiver.recv()
+            except EOFError: # the worker died before reporting, e.g. killed for memory
+                process.join()
+                status, strategy, elapsed = 'crashed (exit %s)' % process.exitcode, [], time.time() - started
+            process.join()
+            receiver.close()
+            summary[levelPath] = (status, strategy, elapsed)
+            if strategy:
+                with open(os.path.join(outDir, answerFileName(levelPath)), 'w') as file:
+                    file.write(', '.join(str(i) for i in strategy))
+        now = time.time()
+        for receiver, (levelPath, process, started) in list(running.items()):
+            if timeLimit and now - started > timeLimit:
+                process.terminate()
+                process.join()
+                receiver.close()
+                summary[levelPath] = ('time limit', [], now - started)
+                del running[receiver]
+    rows = [(os.path.basename(levelPath), status, len(strategy), sum(1 for x in strategy if x.isupper()), elapsed)
+            for levelPath, (status, strategy, elapsed) in ((path, summary[path]) for path in levels)]
+    printSummary(rows)
+    return rows
+
+def printSummary(rows):
+    """Print the batch summary as a table"""
+    print('%-20s %-18s %7s %7s %9s' % ('level', 'status', 'moves', 'pushes', 'seconds'))
+    for name, status, moves, pushes, elapsed in rows:
+        print('%-20s %-18s %7d %7d %9.3f' % (name, status, moves, pushes, elapsed))
+    solved = sum(1 for row in rows if row[1] == 'solved')
+    print('%d/%d levels solved' % (solved, len(rows)))
+
+"""Answer verification: python -m solver verify <levels dir> --answers <answers dir>"""
+
+def readAnswerFile(path):
+    """Read the moves of an answer file, written as comma separated letters"""
+    with open(path) as file:
+        content = file.read().strip()
+    return content.split(', ') if content else []
+
+def answerError(structure, playerPos, moves):
+    """Replay an answer move by move and describe why it fails"""
+    structure = [list(row) for row in structure]
+    playerPos = list(playerPos)
+    for index, letter in enumerate(moves):
+        if len(letter) != 1 or letter.lower() not in engine.DIRECTIONS:
+            return 'bad letter at %d' % (index + 1)
+        played = engine.step(structure, playerPos, letter)
+        if played is None:
+            return 'blocked at %d' % (index + 1)
+        if played != letter:
+            return 'wrong case at %d' % (index + 1)
+    return 'unsolved'
+
+def verifyAnswers(levelDir, answerDir):
+    """Replay the answer file of every level of a directory, all levels stepped together, and return
+    the summary rows (level, status, moves, pushes)"""
+    levels = sorted((os.path.join(levelDir, name) for name in os.listdir(levelDir) if name.endswith('.txt')), key=naturalKey)
+    answers = {}
+    for levelPath in levels:
+        answerPath = os.path.join(answerDir, answerFileName(levelPath))
+        if os.path.isfile(answerPath):
+            answers[levelPath] = readAnswerFile(answerPath)
+    checked = [levelPath for levelPath in levels if levelPath in answers
+               and all(len(letter) == 1 and letter.lower() in engine.DIRECTIONS for letter in answers[levelPath])]
+    boards = {levelPath: engine.load_level(levelPath) for levelPath in answers}
+    valid = {}
+    if checked:
+        stacked, players = engine.stack_boards([boards[levelPath] for levelPath in checked])
+        valid = dict(zip(checked, engine.replay_batch(stacked, players, [answers[levelPath] for levelPath in checked])))
+    rows = []
+    for levelPath in levels:
+        moves = answers.get(levelPath)
+        if moves is None:
+            status, moves = 'missing', []
+        elif valid.get(levelPath):
+            status = 'ok'
+        else:
+            status = answerError(*boards[levelPath], moves)
+        rows.append((os.path.basename(levelPath), status, len(moves), sum(1 for x in moves if x.isupper())))
+    return rows
+
+def printVerification(rows):
+    """Print the verification summary as a table"""
+    print('%-20s %-18s %7s %7s' % ('level', 'status', 'moves', 'pushes'))
+    for name, status, moves, pushes in rows:
+        print('%-20s %-18s %7d %7d' % (name, status, moves, pushes))
+    print('%d/%d answers verified' % (sum(1 for row in rows if row[1] == 'ok'), len(rows)))
+
+def printProgress(stats):
+    """Log the progress of a search"""
+    print('%.1f s: %d expanded, %d generated, frontier %d, explored %d'
+          % (stats.elapsed(), stats.expanded, stats.generated, stats.peakFrontier, stats.peakExplored))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver', description='Headless Sokoban solver')
+    commands = parser.add_subparsers(dest='command', required=True)
+    batch = commands.add_parser('batch', help='solve every level file of a directory')
+    batch.add_argument('levels', help='directory of level files')
+    batch.add_argument('--out', default='assets/answer', help='directory receiving the answer files')
+    batch.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of levels solved in parallel')
+    batch.add_argument('--method', default='astar', choices=METHODS)
+    batch.add_argument('--mode', default='moves', choices=('moves', 'pushes'))
+    batch.add_argument('--time-limit', type=float, default=60, help='seconds allowed per level, 0 for none')
+    batch.add_argument('--memory-limit', type=int, default=2048, help='megabytes allowed per level, 0 for none')
+    batch.add_argument('--table-size', type=int, default=256, help='megabytes of explored states kept per search')
+    profile = commands.add_parser('profile', help='solve one level and report where the search spends its time')
+    profile.add_argument('level', help='level file')
+    profile.add_argument('--method', default='astar', choices=METHODS)
+    profile.add_argument('--mode', default='moves', choices=('moves', 'pushes'))
+    profile.add_argument('--interval', type=int, default=10000, help='expansions between two progress lines')
+    profile.add_argument('--time-budget', type=float, help='seconds after which the search stops')
+    profile.add_argument('--max-expansions', type=int, help='expansions after which the search stops')
+    profile.add_argument('--max-memory', type=int, help='megabytes of estimated search memory after which the search stops')
+    verify = commands.add_parser('verify', help='check that the answer files solve their levels')
+    verify.add_argument('levels', help='directory of level files')
+    verify.add_argument('--answers', default='assets/answer', help='directory of the answer files')
+    args = parser.parse_args(argv)
+    if args.command == 'verify':
+        rows = verifyAnswers(args.levels, args.answers)
+        printVerification(rows)
+        return 0 if all(row[1] == 'ok' for row in rows) else 1
+    if args.command == 'profile':
+        stats = SearchStats(callback=printProgress, interval=args.interval, timePhases=True)
+        budget = SearchBudget(args.time_budget, args.max_expansions, args.max_memory * 1024 * 1024 if args.max_memory else None)
+        strategy = solve(loadLevelFile(args.level), args.method, args.mode, stats=stats, budget=budget,
+                         onSolution=lambda moves: print('solution of %d moves, %d pushes after %.3f s'
+                                                        % (len(moves), sum(1 for x in moves if x.isupper()), stats.elapsed())))
+        print(stats.report())
+        print('solution     ', ''.join(strategy) if strategy else 'none')
+        return 0 if strategy else 1
+    if args.command == 'batch':
+        rows = batchSolve(args.levels, args.out, max(1, args.workers), args.method, args.mode,
+                          args.time_limit, args.memory_limit * 1024 * 1024, args.table_size * 1024 * 1024)
+        return 0 if all(row[1] == 'solved' for row in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+import pytest
+import constants as SOKOBAN
+
+
+class SilentSound:
+    def __init__(self, *args):
+        pass
+
+    def play(self, *args):
+        pass
+
+
+@pytest.fixture
+def window(monkeypatch):
+    """A headless window, run from the repository root where the assets live."""
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(pygame.mixer, 'init', lambda *args, **kwargs: None)
+    monkeypatch.setattr(pygame.mixer, 'Sound', SilentSound)
+    pygame.init()
+    yield pygame.display.set_mode((SOKOBAN.WINDOW_WIDTH, SOKOBAN.WINDOW_HEIGHT))
+    pygame.quit()
@@ -0,0 +1,61 @@
+import pytest
+import engine
+from game import Game
+from level_pack import LevelPack
+
+PACK = """#######
+#     #
+#@ $ .#
+#######
+
+#####
+#@$.#
+#####
+"""
+
+
+@pytest.fixture
+def game(window, tmp_path, monkeypatch):
+    path = tmp_path / "pack.xsb"
+    path.write_text(PACK)
+    pack = LevelPack(str(path))
+    game = Game(window, pack)
+    monkeypatch.setattr(game, 'save_scoreboard', lambda scoreboard: None)
+    yield game
+    pack.close()
+
+
+def play(game, count):
+    for _ in range(count):
+        game.play_next_moves()
+
+
+def test_cheaper_solution_replaces_playback(game):
+    start = list(game.player.pos)
+    game.improve_playback(['u', 'r', 'd', 'R', 'R'])
+    play(game, 2)
+    assert game.player.pos != start
+    game.improve_playback(['r', 'R', 'R'])
+    # The two moves played are not part of the new solution: they are undone
+    assert game.player.pos == start
+    assert game.playback_index == 0
+    play(game, 3)
+    assert game.index_level == 2
+
+
+def test_shared_moves_are_kept(game):
+    game.improve_playback(['r', 'u', 'd', 'R', 'R'])
+    play(game, 1)
+    game.improve_playback(['r', 'R', 'R'])
+    assert game.playback_index == 1
+    play(game, 2)
+    assert game.index_level == 2
+
+
+
+def test_answer_file_checked_on_current_layout(window):
+    game = Game(window)
+    strategy = game.read_answer_file()
+    assert strategy and engine.replay(game.level.structure, game.level.position_player, strategy)
+    game.player.step('r', game.level, game.player_interface)
+    assert game.read_answer_file() is None
@@ -0,0 +1,87 @@
+import pytest
+import Sokoban
+from game import Game
+from level_pack import LevelDirectory, LevelPack
+
+PACK = """Level 1
+#####
+#@$.#
+#####
+
+Level 2
+######
+#@ $.#
+######
+"""
+
+
+@pytest.fixture
+def pack(tmp_path):
+    path = tmp_path / "pack.xsb"
+    path.write_text(PACK)
+    pack = LevelPack(str(path))
+    yield pack
+    pack.close()
+
+
+def win(game, monkeypatch):
+    monkeypatch.setattr(game, 'save_scoreboard', lambda scoreboard: None)
+    game.level.remaining_targets = 0
+    game.has_win()
+
+
+def test_bundled_levels(window, monkeypatch):
+    game = Game(window)
+    assert game.index_level == 13
+    assert game.pack.extreme_level == len(game.pack)
+    win(game, monkeypatch)
+    assert game.index_level == 14
+
+
+def test_pack_starts_at_first_level(window, monkeypatch, pack):
+    game = Game(window, pack)
+    assert game.index_level == 1
+    assert pack.extreme_level is None
+    win(game, monkeypatch)
+    assert game.index_level == 2
+    # The last level of a pack is not followed by the extreme level prompt
+    win(game, monkeypatch)
+    assert game.index_level == 1
+
+
+def test_other_directory_has_no_extreme_level(tmp_path):
+    (tmp_path / "test1.txt").write_text("#####\n#@$.#\n#####\n")
+    directory = LevelDirectory(str(tmp_path))
+    assert directory.first_level == 1
+    assert directory.extreme_level is None
+
+
+class StartedGame:
+    """Records the level a menu entry starts instead of running the game loop."""
+    started = []
+
+    def __init__(self, window, pack):
+        self.pack = pack if pack is not None else LevelDirectory()
+        self.index_level = self.pack.first_level
+
+    def load_level(self):
+        pass
+
+    def start(self, play_music=True):
+        StartedGame.started.append(self.index_level)
+
+
+def click_extreme_level(menu, window):
+    x, y = menu.extreme_game_txt_position
+    surface = menu.load_game_txt_surface
+    return menu.click((x + surface.get_width() // 2, y + surface.get_height() // 2), window)
+
+
+def test_menu_extreme_level(window, monkeypatch, pack):
+    monkeypatch.setattr(Sokoban, 'Game', StartedGame)
+    monkeypatch.setattr(StartedGame, 'started', [])
+    assert click_extreme_level(Sokoban.Menu(), window)
+    assert StartedGame.started == [len(LevelDirectory())]
+    # A pack has no extreme level: the entry is not shown and ignores clicks
+    assert click_extreme_level(Sokoban.Menu(pack), window)
+    assert StartedGame.started == [len(LevelDirectory())]
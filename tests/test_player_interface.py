@@ -0,0 +1,38 @@
+import pytest
+import pygame
+from pygame.locals import MOUSEBUTTONUP
+from game import Game
+
+
+def click_label(game, position, surface):
+    x, y = position
+    pos = (x + surface.get_width() // 2, y + surface.get_height() // 2)
+    game.process_event(pygame.event.Event(MOUSEBUTTONUP, pos=pos, button=1))
+
+
+def test_auto_then_cancel(window, monkeypatch):
+    game = Game(window)
+    game.update_screen()
+    interface = game.player_interface
+    # Force a background solve: no cached solution and no answer file
+    monkeypatch.setattr(game.solution_cache, 'get', lambda *args: None)
+    monkeypatch.setattr(game, 'read_answer_file', lambda: None)
+
+    click_label(game, interface.posTxtAuto, interface.txtAutoSurface)
+    assert game.solver_process is not None
+    assert interface.txtSolving
+
+    click_label(game, interface.posTxtCancelSolving, interface.txtCancelSolvingSurface)
+    assert game.solver_process is None
+    assert interface.txtSolving is None
+    assert not game.playback
+
+
+def test_cancel_label_ignored_when_not_solving(window, monkeypatch):
+    game = Game(window)
+    game.update_screen()
+    interface = game.player_interface
+    monkeypatch.setattr(game, 'cancel_solver', lambda: pytest.fail("no solver to cancel"))
+
+    click_label(game, interface.posTxtCancelSolving, interface.txtCancelSolvingSurface)
+    assert game.solver_process is None
@@ -0,0 +1,26 @@
+import os
+import engine
+from solution_cache import SolutionCache, layout_key
+
+LEVEL = ["#######", "#     #", "#@ $ .#", "#######"]
+
+
+def test_cached_solutions_are_replayed(tmp_path):
+    structure, player_pos = engine.parse_level(LEVEL)
+    cache = SolutionCache(str(tmp_path))
+    assert not cache.put(structure, player_pos, 'astar', 'moves', ['r', 'R'])
+    assert cache.put(structure, player_pos, 'astar', 'moves', ['r', 'R', 'R'])
+    assert cache.get(structure, player_pos, 'astar', 'moves') == ['r', 'R', 'R']
+    # A file that no longer solves the level is deleted when it is read
+    file_name = cache.file_name(layout_key(structure, player_pos, 'astar', 'moves'))
+    with open(file_name, 'w') as file:
+        file.write('{"moves": "rrR"}')
+    assert SolutionCache(str(tmp_path)).get(structure, player_pos, 'astar', 'moves') is None
+    assert not os.path.exists(file_name)
+
+
+def test_key_ignores_padding():
+    structure, player_pos = engine.parse_level(LEVEL)
+    padded, padded_pos = engine.parse_level(["#########"] + ["#" + row + "#" for row in LEVEL])
+    assert layout_key(structure, player_pos, 'astar', 'moves') == layout_key(padded, padded_pos, 'astar', 'moves')
+    assert layout_key(structure, player_pos, 'astar', 'moves') != layout_key(structure, [2, 2], 'astar', 'moves')
@@ -0,0 +1,65 @@
+import random
+import pytest
+import engine
+import solver
+
+LEVEL = "assets/sokobanLevels/test5.txt"
+
+
+@pytest.fixture
+def game_state(monkeypatch):
+    monkeypatch.chdir(solver.os.path.dirname(solver.os.path.abspath(solver.__file__)))
+    return solver.loadLevelFile(LEVEL)
+
+
+@pytest.mark.parametrize('mode', ['moves', 'pushes'])
+def test_anytime_improves_until_optimal(game_state, mode):
+    found = []
+    stats = solver.SearchStats()
+    best = solver.solve(game_state, 'anytime', mode, stats=stats, onSolution=found.append)
+    costs = [solver.solutionCost(moves, mode) for moves in found]
+    assert found and found[-1] == best
+    assert costs == sorted(set(costs), reverse=True)
+    assert costs[-1] == solver.solutionCost(solver.solve(game_state, 'astar', mode), mode)
+    assert engine.replay(*engine.load_level(LEVEL), best)
+
+
+@pytest.mark.parametrize('sendContext', [False, True])
+def test_background_worker_streams_solutions(monkeypatch, sendContext):
+    monkeypatch.chdir(solver.os.path.dirname(solver.os.path.abspath(solver.__file__)))
+    from level import Level
+    cells = Level(5).solver_cells()
+    context = solver.LevelContext(*cells[:3]) if sendContext else None
+    receiver, sender = solver.multiprocessing.Pipe(duplex=False)
+    solver.backgroundWorker(cells, 'anytime', 'moves', sender, context=context)
+    messages = []
+    try:
+        while True:
+            messages.append(receiver.recv())
+    except EOFError: # the worker closed its end after the last message
+        pass
+    solutions = [moves for kind, moves in messages if kind == 'solution']
+    assert [len(moves) for moves in solutions] == [24, 22, 20]
+    assert messages[-1] == ('done', solutions[-1])
+
+
+def test_search_rules_match_engine(monkeypatch):
+    monkeypatch.chdir(solver.os.path.dirname(solver.os.path.abspath(solver.__file__)))
+    from level import Level
+    rng = random.Random(7)
+    for number in range(1, 17):
+        level = Level(number)
+        structure, player = level.structure, level.position_player
+        width, walls, goals, cell, boxMask = level.solver_cells()
+        ctx = solver.cachedLevelContext(width, walls, goals)
+        for _ in range(200):
+            actions = {action[1]: action for action in solver.legalActions(ctx, cell, boxMask)}
+            allowed = {engine.try_move(structure, player, letter) for letter in engine.DIRECTIONS} - {None}
+            assert set(actions) == allowed
+            letter = rng.choice('udlr')
+            move = engine.step(structure, player, letter)
+            if move:
+                cell, boxMask = solver.updateState(cell, boxMask, actions[move])
+            assert cell == player[1] * width + player[0]
+            assert set(solver.cellsOf(boxMask)) == {y * width + x for y, row in enumerate(structure)
+                                                     for x, tile in enumerate(row) if tile in engine.BOXES}
@@ -0,0 +1,63 @@
+import collections
+
+
+class TextCache:
+    def __init__(self, max_entries=256):
+        """
+        Initializes a new TextCache object.
+
+        Rendered text surfaces are kept in an LRU keyed by (font, text, color,
+        background), so a label drawn on every frame is rasterized only once.
+        The surfaces are shared: callers blit them and must not draw on them.
+
+        Args:
+            max_entries (int): The number of surfaces kept.
+
+        Returns:
+            None
+        """
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def render(self, font, text, color, background=None):
+        """
+        Returns the surface of a text, rendering it only on the first request.
+
+        Args:
+            font (pygame.font.Font): The font of the text.
+            text (str): The text to render.
+            color (tuple): The color of the text.
+            background (tuple): The background color, None for a transparent background.
+
+        Returns:
+            pygame.Surface: The rendered text.
+        """
+        key = (font, text, color, background)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color, background)
+        self.entries[key] = surface
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, color, background=None):
+    """
+    Renders an antialiased text through the shared cache.
+
+    Args:
+        font (pygame.font.Font): The font of the text.
+        text (str): The text to render.
+        color (tuple): The color of the text.
+        background (tuple): The background color, None for a transparent background.
+
+    Returns:
+        pygame.Surface: The rendered text.
+    """
+    return TEXT_CACHE.render(font, text, color, background)